@@ -0,0 +1,40 @@
+"""
+Offline benchmarks for the inventory hot paths.
+
+Each module runs as ``python -m benchmarks.<name>`` from the project root
+and works on a throwaway test database, never the configured one.
+"""
+import contextlib
+import os
+import time
+
+
+def setup():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+    import django
+
+    django.setup()
+
+
+@contextlib.contextmanager
+def scratch_database():
+    """Create and migrate a test database for the duration of the block."""
+    from django.db import connection
+
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def best_of(func, repeat=5):
+    """Fastest of ``repeat`` runs of ``func``, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
@@ -0,0 +1,202 @@
+"""
+Throughput of the JSON API under uvicorn with many concurrent clients.
+
+    pip install uvicorn
+    python -m benchmarks.api_load --clients 100 --seconds 20 --workers 2
+
+Seeds a scratch database (a file, so the server processes can open it),
+starts ``uvicorn project.asgi:application`` on it and drives the API from
+``--clients`` keep-alive connections in one asyncio loop. The request mix
+is mostly reads: item lookups, lot listings, and a share of dispenses and
+receipts. Prints requests per second and latency per endpoint.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from benchmarks import scratch_database, setup
+
+MIX = (("item", 60), ("lots", 25), ("dispense", 10), ("receive", 5))
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection; just enough for JSON requests."""
+
+    def __init__(self, host, port, headers):
+        self.host, self.port, self.headers = host, port, headers
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", *self.headers]
+        if body is not None:
+            head += ["Content-Type: application/json", f"Content-Length: {len(payload)}"]
+        self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + payload)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length, close = 0, False
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode().partition(":")
+            match name.strip().lower():
+                case "content-length":
+                    length = int(value)
+                case "connection":
+                    close = value.strip().lower() == "close"
+        await self.reader.readexactly(length)
+        if close:
+            self.writer.close()
+            self.writer = None
+        return status
+
+
+def seed(items, lots):
+    """Catalogue, lots and a staff session; returns item ids and request headers."""
+    from django.conf import settings
+    from django.test import Client
+    from django.utils.crypto import get_random_string
+
+    from benchmarks.factories import seed_items, seed_lots
+    from users.models import CustomUser
+
+    rng = random.Random(0)
+    item_ids = seed_items(items, rng=rng)
+    seed_lots(item_ids, lots, rng=rng)
+    user = CustomUser.objects.create_user(email="load@example.com", password="!", is_staff=True)
+    client = Client()
+    client.force_login(user)
+    session = client.cookies[settings.SESSION_COOKIE_NAME].value
+    csrf = get_random_string(32)
+    headers = [
+        f"Cookie: {settings.SESSION_COOKIE_NAME}={session}; {settings.CSRF_COOKIE_NAME}={csrf}",
+        f"X-CSRFToken: {csrf}",
+    ]
+    return item_ids, headers
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database, port, workers):
+    env = dict(os.environ, DB_NAME=str(database))
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "project.asgi:application",
+            "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+            "--no-access-log", "--log-level", "warning",
+        ],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit("uvicorn exited; is it installed?")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit("uvicorn did not start listening")
+
+
+async def client(port, headers, item_ids, stop_at, results, rng):
+    connection = Connection("127.0.0.1", port, headers)
+    names, weights = zip(*MIX)
+    # One delivery lot per item two years out, so receipts mostly top it up.
+    expiry = (datetime.date.today() + datetime.timedelta(days=730)).isoformat()
+    while time.monotonic() < stop_at:
+        name = rng.choices(names, weights)[0]
+        item = rng.choice(item_ids)
+        match name:
+            case "item":
+                request = ("GET", f"/inventory/api/items/{item}/", None)
+            case "lots":
+                request = ("GET", f"/inventory/api/items/{item}/lots/", None)
+            case "dispense":
+                request = ("POST", f"/inventory/api/items/{item}/dispense/", {"quantity": 1})
+            case "receive":
+                request = ("POST", f"/inventory/api/items/{item}/receive/",
+                           {"quantity": 5, "expiration_date": expiry})
+        start = time.perf_counter()
+        try:
+            status = await connection.request(*request)
+        except (OSError, asyncio.IncompleteReadError, IndexError, ValueError):
+            connection.writer = None
+            status = "error"
+        results[name].append((time.perf_counter() - start, status))
+
+
+async def drive(port, headers, item_ids, clients, seconds):
+    results = defaultdict(list)
+    stop_at = time.monotonic() + seconds
+    await asyncio.gather(*(
+        client(port, headers, item_ids, stop_at, results, random.Random(n))
+        for n in range(clients)
+    ))
+    return results
+
+
+def report(results, seconds):
+    total = sum(len(samples) for samples in results.values())
+    print(f"{total} requests in {seconds}s: {total / seconds:.0f} req/s")
+    print(f"{'endpoint':<10}{'req/s':>8}{'median':>10}{'p95':>10}{'max':>10}  statuses")
+    for name, _ in MIX:
+        samples = results.get(name)
+        if not samples:
+            continue
+        timings = sorted(elapsed * 1000 for elapsed, _ in samples)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        statuses = ", ".join(f"{status}: {n}" for status, n in sorted(Counter(s for _, s in samples).items(), key=str))
+        print(
+            f"{name:<10}{len(samples) / seconds:>8.0f}{statistics.median(timings):>8.1f}ms"
+            f"{p95:>8.1f}ms{timings[-1]:>8.1f}ms  {statuses}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--lots", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--seconds", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    setup()
+    from django.db import connection
+
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == "sqlite":
+            # The default in-memory test database is invisible to the server.
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(directory, "api_load.sqlite3")
+        with scratch_database():
+            item_ids, headers = seed(args.items, args.lots)
+            connection.close()
+            port = free_port()
+            server = start_server(connection.settings_dict["NAME"], port, args.workers)
+            try:
+                results = asyncio.run(drive(port, headers, item_ids, args.clients, args.seconds))
+            finally:
+                server.terminate()
+                server.wait()
+            report(results, args.seconds)
+
+
+if __name__ == "__main__":
+    main()
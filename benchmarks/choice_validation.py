@@ -0,0 +1,63 @@
+"""
+Per-save cost of InventoryItem choice validation: rebuilding ``.values``
+lists on every check versus the cached reference tables.
+
+    python -m benchmarks.choice_validation --number 100000
+"""
+import argparse
+import timeit
+
+from benchmarks import scratch_database, setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=100_000)
+    args = parser.parse_args()
+
+    setup()
+    from django.core.exceptions import ValidationError
+
+    from medicines.models import (
+        Category,
+        CategoryType,
+        InventoryItem,
+        Packaging,
+        PackagingType,
+        Subcategory,
+        SubcategoryType,
+        Unit,
+        UnitType,
+    )
+
+    with scratch_database():
+        item = InventoryItem(
+            category=Category.objects.get_for(CategoryType.VITAMINS_SUPPLEMENTS),
+            subcategory=Subcategory.objects.get_for(SubcategoryType.ENERGY_ENDURANCE),
+            item_name="Item",
+            brand_name="Brand",
+            generic_name="Generic",
+            dosage_form="Tablet",
+            packaging=Packaging.objects.get_for(PackagingType.SIXTY_PER_BOTTLE),
+            quantity=60,
+            unit_size=Unit.objects.get_for(UnitType.TABLET),
+        )
+
+        def list_clean():
+            # The validation InventoryItem.clean did before the cached sets.
+            if item.unit_size.value not in UnitType.values:
+                raise ValidationError("unit")
+            if item.category.value not in CategoryType.values:
+                raise ValidationError("category")
+            if item.subcategory.value not in SubcategoryType.values:
+                raise ValidationError("subcategory")
+            if item.packaging.value not in PackagingType.values:
+                raise ValidationError("packaging")
+
+        for label, func in (("list .values", list_clean), ("cached tables", item.clean)):
+            seconds = min(timeit.repeat(func, number=args.number, repeat=5))
+            print(f"{label:<14} {seconds / args.number * 1e6:.2f} us per clean()")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Fast synthetic data for benchmarks; everything goes through ``bulk_create``."""
+import datetime
+import itertools
+import random
+import uuid
+
+from django.utils import timezone
+
+from medicines.models import (
+    Category,
+    InventoryItem,
+    InventoryStock,
+    InventoryTransaction,
+    Packaging,
+    Subcategory,
+    Unit,
+)
+from users.models import CustomUser
+
+BATCH_SIZE = 5000
+
+
+def batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while batch := list(itertools.islice(iterator, size)):
+        yield batch
+
+
+def seed_users(count):
+    users = CustomUser.objects.bulk_create(
+        CustomUser(email=f"bench{n}@example.com", username=f"bench{n}", password="!") for n in range(count)
+    )
+    return [user.pk for user in users]
+
+
+def seed_items(count, rng=random):
+    """Create ``count`` catalogue items and return their primary keys."""
+    categories, subcategories, packagings, units = (
+        list(model.objects.values_list("pk", flat=True))
+        for model in (Category, Subcategory, Packaging, Unit)
+    )
+    ids = []
+    for batch in batched(range(count)):
+        items = [
+            InventoryItem(
+                id=str(uuid.uuid4()),
+                category_id=rng.choice(categories),
+                subcategory_id=rng.choice(subcategories),
+                item_name=f"Item {n}",
+                brand_name=f"Brand {n % 997}",
+                generic_name=f"Generic {n % 311}",
+                dosage_form="Tablet",
+                packaging_id=rng.choice(packagings),
+                quantity=rng.randint(1, 100),
+                unit_size_id=rng.choice(units),
+            )
+            for n in batch
+        ]
+        InventoryItem.objects.bulk_create(items)
+        ids.extend(item.pk for item in items)
+    return ids
+
+
+def seed_lots(item_ids, count, rng=random, today=None):
+    """
+    Spread ``count`` lots over ``item_ids``; expiries run from a year ago to
+    three years out. Returns the lot primary keys.
+    """
+    today = today or datetime.date.today()
+    expiry_offsets = range(-365, 3 * 365)
+    per_item = min(max(1, count // len(item_ids)), len(expiry_offsets))
+
+    def lots():
+        for item_id in item_ids:
+            offsets = rng.sample(expiry_offsets, per_item)
+            for offset in offsets:
+                yield InventoryStock(
+                    item_id=item_id,
+                    expiration_date=today + datetime.timedelta(days=offset),
+                    date_of_delivery=today,
+                    count=rng.choice((0, rng.randint(1, 500))),
+                )
+
+    ids = []
+    for batch in batched(itertools.islice(lots(), count)):
+        ids.extend(lot.pk for lot in InventoryStock.objects.bulk_create(batch))
+    return ids
+
+
+def seed_transactions(stock_ids, user_ids, count, days=365, rng=random):
+    """Create ``count`` transactions spread over the last ``days`` days."""
+    now = timezone.now()
+    span = days * 24 * 3600
+    for batch in batched(range(count)):
+        InventoryTransaction.objects.bulk_create(
+            InventoryTransaction(
+                item_stock_id=rng.choice(stock_ids),
+                user_id=rng.choice(user_ids),
+                quantity=rng.randint(1, 20),
+                transaction_type=rng.choice((InventoryTransaction.ADD, InventoryTransaction.REMOVE)),
+                created_at=now - datetime.timedelta(seconds=rng.randrange(span)),
+            )
+            for _ in batch
+        )
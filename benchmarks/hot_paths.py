@@ -0,0 +1,202 @@
+"""
+Latency and queries per operation for the inventory hot paths.
+
+    python -m benchmarks.hot_paths --output before.json
+    python -m benchmarks.hot_paths --output after.json --compare before.json
+
+Seeds a synthetic catalogue, then times each operation over random
+targets. Results go to stdout and, with --output, to a JSON file that a
+later run can --compare against.
+"""
+import argparse
+import datetime
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+
+from benchmarks import scratch_database, setup
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(operation, targets):
+    """Run ``operation`` once per target; timings in ms and statements per call."""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    queries = []
+    for target in targets:
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            operation(target)
+            timings.append((time.perf_counter() - start) * 1000)
+        queries.append(sum(1 for query in ctx.captured_queries if "SAVEPOINT" not in query["sql"]))
+    timings.sort()
+    return {
+        "runs": len(timings),
+        "median_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+        "max_ms": round(timings[-1], 3),
+        "queries": round(statistics.mean(queries), 2),
+    }
+
+
+def operations(user):
+    from medicines import reports, search
+    from medicines.models import InventoryItem, InventoryStock, InventoryTransaction
+    from medicines.services import dispense
+
+    def receive(stock_id):
+        InventoryTransaction.objects.create(
+            item_stock_id=stock_id, user=user, quantity=10, transaction_type=InventoryTransaction.ADD
+        )
+
+    def edit(transaction_id):
+        transaction = InventoryTransaction.objects.get(pk=transaction_id)
+        transaction.quantity = 1
+        transaction.save()
+
+    def delete(transaction_id):
+        InventoryTransaction.objects.get(pk=transaction_id).delete()
+
+    def item_save(item_id):
+        item = InventoryItem.objects.get(pk=item_id)
+        item.clean()
+        item.save()
+
+    def lookup(item_id):
+        list(
+            InventoryStock.objects.filter(item_id=item_id, count__gt=0)
+            .order_by("expiration_date")
+            .values_list("pk", "expiration_date", "count")
+        )
+
+    def on_hand(item_id):
+        InventoryItem.objects.select_related("stock_summary").get(pk=item_id).stock_summary.sellable
+
+    return {
+        # Receive first so dispenses are not starved by empty lots.
+        "receive": (receive, "lot"),
+        "dispense": (lambda item_id: dispense(InventoryItem(pk=item_id), 1, user), "stocked_item"),
+        "edit": (edit, "transaction"),
+        "delete": (delete, "transaction"),
+        "item_save": (item_save, "item"),
+        "lookup": (lookup, "item"),
+        "on_hand": (on_hand, "item"),
+        "search": (lambda q: search.search(q, limit=10), "query"),
+        "report_expiry": (lambda _: reports.expiry_by_category_week(weeks=12), "none"),
+        "report_cover": (lambda _: reports.days_of_cover(window_days=30), "none"),
+    }
+
+
+def targets(kind, rng, runs, pools):
+    if kind == "none":
+        return [None] * max(1, runs // 20)
+    if kind == "transaction":
+        # Edits and deletes each consume their own rows. Both only shrink
+        # removals, so they never fail for want of stock.
+        return [pools["transaction"].pop() for _ in range(runs)]
+    return [rng.choice(pools[kind]) for _ in range(runs)]
+
+
+def compare(results, baseline):
+    print(f"\n{'vs baseline':<14}{'median':>10}{'queries':>10}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before:
+            ratio = result["median_ms"] / before["median_ms"] if before["median_ms"] else float("nan")
+            queries = result["queries"] - before["queries"]
+            print(f"{name:<14}{ratio:>9.2f}x{queries:>+10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--lots", type=int, default=100_000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=200, help="Calls per operation.")
+    parser.add_argument("--only", nargs="*", help="Operations to run; all by default.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    parser.add_argument("--compare", help="A previous --output file to compare against.")
+    args = parser.parse_args()
+
+    setup()
+    from django.db.models import F
+
+    from benchmarks import factories
+    from medicines.models import InventoryTransaction, StockSummary
+    from users.models import CustomUser
+
+    rng = random.Random(args.seed)
+    with scratch_database():
+        start = time.perf_counter()
+        user_ids = factories.seed_users(10)
+        item_ids = factories.seed_items(args.items, rng=rng)
+        stock_ids = factories.seed_lots(item_ids, args.lots, rng=rng)
+        factories.seed_transactions(stock_ids, user_ids, args.transactions, rng=rng)
+        StockSummary.objects.rebuild()
+        print(f"seeded in {time.perf_counter() - start:.0f} s")
+
+        transactions = list(
+            InventoryTransaction.objects.filter(transaction_type=InventoryTransaction.REMOVE)
+            .order_by("?")
+            .values_list("pk", flat=True)[: 2 * args.runs]
+        )
+        pools = {
+            "item": item_ids,
+            "lot": stock_ids,
+            "stocked_item": list(
+                StockSummary.objects.filter(total__gt=F("expired")).values_list("item_id", flat=True)
+            ),
+            "transaction": transactions,
+            "query": ["item 1", "brand 9", "generic 31", "ite", "no such thing"],
+        }
+        user = CustomUser.objects.get(pk=user_ids[0])
+
+        results = {}
+        print(f"{'operation':<14}{'median':>10}{'p95':>10}{'max':>10}{'queries':>9}")
+        for name, (operation, kind) in operations(user).items():
+            if args.only and name not in args.only:
+                continue
+            result = measure(operation, targets(kind, rng, args.runs, pools))
+            results[name] = result
+            print(
+                f"{name:<14}{result['median_ms']:>8.2f}ms{result['p95_ms']:>8.2f}ms"
+                f"{result['max_ms']:>8.2f}ms{result['queries']:>9.2f}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(
+                {
+                    "commit": git_commit(),
+                    "at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                    "python": platform.python_version(),
+                    "parameters": {
+                        name: getattr(args, name)
+                        for name in ("items", "lots", "transactions", "runs", "seed")
+                    },
+                    "results": results,
+                },
+                handle,
+                indent=2,
+            )
+    if args.compare:
+        with open(args.compare) as handle:
+            compare(results, json.load(handle)["results"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Index size and join speed for the old text item key against the UUIDField
+key from ``0017_inventoryitem_uuid_pk``.
+
+    python -m benchmarks.item_keys --items 100000 --lots 1000000
+
+Builds a catalogue and lot table pair for each key type in a scratch
+database, with the same UUIDs and the same lots. "text" is the old
+varchar(128) holding the dashed form; "uuid" is the column UUIDField
+creates (32 hex characters on SQLite, native uuid on PostgreSQL).
+"""
+import argparse
+import random
+import uuid
+
+from benchmarks import best_of, scratch_database, setup
+
+
+def key_types(connection):
+    from django.db import models
+
+    field = models.UUIDField()
+    return {
+        "text": ("varchar(128)", str),
+        "uuid": (field.db_type(connection), lambda value: field.get_db_prep_value(value, connection)),
+    }
+
+
+def create_tables(cursor, name, column, items, lots):
+    cursor.execute(f"CREATE TABLE bench_item_{name} (id {column} PRIMARY KEY, category varchar(64) NOT NULL)")
+    cursor.execute(
+        f"CREATE TABLE bench_lot_{name} (id integer PRIMARY KEY, "
+        f"item_id {column} NOT NULL REFERENCES bench_item_{name} (id), count integer NOT NULL)"
+    )
+    cursor.execute(f"CREATE INDEX bench_lot_{name}_item_idx ON bench_lot_{name} (item_id)")
+    cursor.executemany(f"INSERT INTO bench_item_{name} (id, category) VALUES (%s, %s)", items)
+    cursor.executemany(f"INSERT INTO bench_lot_{name} (id, item_id, count) VALUES (%s, %s, %s)", lots)
+    cursor.execute(f"ANALYZE bench_item_{name}")
+    cursor.execute(f"ANALYZE bench_lot_{name}")
+
+
+def index_sizes(cursor, connection, name):
+    """Bytes in the item primary key index and the lot item_id index."""
+    if connection.vendor == "sqlite":
+        cursor.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN (%s, %s) GROUP BY name",
+            [f"sqlite_autoindex_bench_item_{name}_1", f"bench_lot_{name}_item_idx"],
+        )
+        sizes = dict(cursor.fetchall())
+        return sizes.get(f"sqlite_autoindex_bench_item_{name}_1"), sizes.get(f"bench_lot_{name}_item_idx")
+    cursor.execute(
+        "SELECT pg_relation_size(%s), pg_relation_size(%s)",
+        [f"bench_item_{name}_pkey", f"bench_lot_{name}_item_idx"],
+    )
+    return cursor.fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--lots", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    setup()
+    rng = random.Random(args.seed)
+    ids = [uuid.UUID(int=rng.getrandbits(128), version=4) for _ in range(args.items)]
+    categories = [f"Category {n}" for n in range(20)]
+    item_categories = [rng.choice(categories) for _ in ids]
+    lot_items = [rng.randrange(args.items) for _ in range(args.lots)]
+    probes = rng.sample(range(args.items), min(args.lookups, args.items))
+
+    with scratch_database() as connection, connection.cursor() as cursor:
+        print(f"{'key':<6}{'pk index':>12}{'fk index':>12}{'join+group':>13}{'point joins':>13}")
+        for name, (column, prep) in key_types(connection).items():
+            keys = [prep(value) for value in ids]
+            create_tables(
+                cursor,
+                name,
+                column,
+                zip(keys, item_categories),
+                ((n, keys[item], rng.randint(0, 500)) for n, item in enumerate(lot_items)),
+            )
+            pk_size, fk_size = index_sizes(cursor, connection, name)
+
+            def grouped():
+                cursor.execute(
+                    f"SELECT i.category, SUM(l.count) FROM bench_lot_{name} l "
+                    f"JOIN bench_item_{name} i ON i.id = l.item_id GROUP BY i.category"
+                )
+                cursor.fetchall()
+
+            def point_joins():
+                for n in probes:
+                    cursor.execute(
+                        f"SELECT SUM(l.count) FROM bench_item_{name} i "
+                        f"JOIN bench_lot_{name} l ON l.item_id = i.id WHERE i.id = %s",
+                        [keys[n]],
+                    )
+                    cursor.fetchone()
+
+            print(
+                f"{name:<6}{pk_size / 2**20:>10.1f}MB{fk_size / 2**20:>10.1f}MB"
+                f"{best_of(grouped, repeat=3):>11.0f}ms{best_of(point_joins, repeat=3):>11.0f}ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
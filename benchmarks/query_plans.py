@@ -0,0 +1,87 @@
+"""
+Query plans and timings for the expiry-report and audit queries, with and
+without the indexes from ``0013_expiry_and_audit_indexes``.
+
+    python -m benchmarks.query_plans --rows 1000000
+
+Seeds ``--rows`` lots and ``--rows`` transactions into a scratch database,
+drops the indexes for the "before" run and recreates them for "after".
+"""
+import argparse
+import datetime
+import random
+
+from benchmarks import best_of, scratch_database, setup
+
+
+def queries():
+    from django.utils import timezone
+
+    from medicines.models import InventoryStock, InventoryTransaction
+
+    today = datetime.date.today()
+    now = timezone.now()
+    item_id = InventoryStock.objects.values_list("item_id", flat=True).first()
+    user_id = InventoryTransaction.objects.values_list("user_id", flat=True).first()
+    return {
+        "lots expiring in 30 days": InventoryStock.objects.filter(
+            count__gt=0,
+            expiration_date__range=(today, today + datetime.timedelta(days=30)),
+        ).values_list("pk", "item_id", "count"),
+        "FEFO lots for one item": InventoryStock.objects.filter(
+            item_id=item_id, count__gt=0, expiration_date__gte=today
+        ).order_by("expiration_date").values_list("pk", "count"),
+        "transactions by user in a week": InventoryTransaction.objects.filter(
+            user_id=user_id,
+            created_at__range=(now - datetime.timedelta(days=7), now),
+        ).values_list("pk", "quantity"),
+    }
+
+
+def report(label, connection):
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+    print(f"== {label}")
+    for name, queryset in queries().items():
+        elapsed = best_of(lambda: list(queryset.all()))
+        print(f"-- {name}: {elapsed:.2f} ms")
+        print(queryset.explain())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    setup()
+    from benchmarks import factories
+    from medicines.models import InventoryStock, InventoryTransaction
+
+    rng = random.Random(args.seed)
+    indexed = [
+        (model, index)
+        for model in (InventoryStock, InventoryTransaction)
+        for index in model._meta.indexes
+    ]
+    with scratch_database() as connection:
+        user_ids = factories.seed_users(args.users)
+        item_ids = factories.seed_items(args.items, rng=rng)
+        stock_ids = factories.seed_lots(item_ids, args.rows, rng=rng)
+        factories.seed_transactions(stock_ids, user_ids, args.rows, rng=rng)
+
+        with connection.schema_editor() as editor:
+            for model, index in indexed:
+                editor.remove_index(model, index)
+        report("before", connection)
+
+        with connection.schema_editor() as editor:
+            for model, index in indexed:
+                editor.add_index(model, index)
+        report("after", connection)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Timings for the expiry and days-of-cover reports over a synthetic history.
+
+    python -m benchmarks.reports --transactions 1000000
+"""
+import argparse
+import random
+
+from benchmarks import best_of, scratch_database, setup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--lots", type=int, default=100_000)
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    setup()
+    from benchmarks import factories
+    from medicines import reports
+    from medicines.models import StockSummary
+
+    rng = random.Random(args.seed)
+    with scratch_database():
+        user_ids = factories.seed_users(10)
+        item_ids = factories.seed_items(args.items, rng=rng)
+        stock_ids = factories.seed_lots(item_ids, args.lots, rng=rng)
+        factories.seed_transactions(stock_ids, user_ids, args.transactions, rng=rng)
+        StockSummary.objects.rebuild()
+
+        expiry = best_of(lambda: reports.expiry_by_category_week(weeks=12), repeat=3)
+        cover = best_of(lambda: reports.days_of_cover(window_days=30), repeat=3)
+        print(f"expiry by category/week: {expiry:.0f} ms")
+        print(f"days of cover (30 days): {cover:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
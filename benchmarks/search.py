@@ -0,0 +1,33 @@
+"""
+Type-ahead latency over a synthetic catalogue.
+
+    python -m benchmarks.search --items 100000
+"""
+import argparse
+import random
+
+from benchmarks import best_of, scratch_database, setup
+
+QUERIES = ("i", "ite", "item 4", "brand 99", "generic 31", "item 12345", "no such thing")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    setup()
+    from benchmarks import factories
+    from medicines import search
+
+    with scratch_database():
+        factories.seed_items(args.items, rng=random.Random(args.seed))
+        for q in QUERIES:
+            elapsed = best_of(lambda: search.search(q, limit=args.limit), repeat=20)
+            print(f"{q!r:<16} {elapsed:6.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
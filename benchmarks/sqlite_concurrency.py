@@ -0,0 +1,140 @@
+"""
+Locked errors and throughput with several tills dispensing at once while
+the admin reads, on SQLite's defaults versus the settings profile.
+
+    python -m benchmarks.sqlite_concurrency --writers 8 --readers 2
+
+Each configuration gets its own database file, since WAL mode persists
+in the file.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+
+def configure(db_path, tuned):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project.settings")
+    from django.conf import settings
+
+    database = {"ENGINE": "django.db.backends.sqlite3", "NAME": db_path}
+    if tuned:
+        database["OPTIONS"] = settings.DATABASES["default"].get("OPTIONS", {})
+    settings.DATABASES = {"default": database}
+
+    import django
+
+    django.setup()
+
+
+def seed(db_path, tuned, lots):
+    configure(db_path, tuned)
+    import datetime
+
+    from django.core.management import call_command
+
+    from benchmarks import factories
+    from medicines.models import InventoryStock
+
+    call_command("migrate", verbosity=0)
+    [item_id] = factories.seed_items(1)
+    today = datetime.date.today()
+    InventoryStock.objects.bulk_create(
+        InventoryStock(item_id=item_id, count=1_000_000, expiration_date=today + datetime.timedelta(days=day))
+        for day in range(1, lots + 1)
+    )
+    return item_id, factories.seed_users(1)[0]
+
+
+def writer(db_path, tuned, item_id, user_id, operations, results):
+    configure(db_path, tuned)
+    from django.db import OperationalError
+
+    from medicines.models import InventoryItem
+    from medicines.services import dispense
+    from users.models import CustomUser
+
+    item = InventoryItem.objects.get(pk=item_id)
+    user = CustomUser.objects.get(pk=user_id)
+    done = locked = 0
+    for _ in range(operations):
+        try:
+            dispense(item, 1, user)
+            done += 1
+        except OperationalError:
+            locked += 1
+    results.put((done, locked))
+
+
+def reader(db_path, tuned, stop, results):
+    configure(db_path, tuned)
+    from django.db import OperationalError, transaction
+
+    from medicines.models import InventoryStock, InventoryTransaction
+
+    done = locked = 0
+    while not stop.is_set():
+        try:
+            # An admin page: a few reads inside one transaction.
+            with transaction.atomic():
+                list(InventoryStock.objects.values_list("id", "count"))
+                list(InventoryTransaction.objects.order_by("-id").values_list("id", "quantity")[:100])
+            done += 1
+        except OperationalError:
+            locked += 1
+    results.put((done, locked))
+
+
+def run(label, tuned, args):
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "bench.sqlite3")
+        with context.Pool(1) as pool:
+            item_id, user_id = pool.apply(seed, (db_path, tuned, args.lots))
+
+        writes, reads = context.Queue(), context.Queue()
+        stop = context.Event()
+        readers = [
+            context.Process(target=reader, args=(db_path, tuned, stop, reads))
+            for _ in range(args.readers)
+        ]
+        writers = [
+            context.Process(target=writer, args=(db_path, tuned, item_id, user_id, args.operations, writes))
+            for _ in range(args.writers)
+        ]
+        for process in readers:
+            process.start()
+        start = time.perf_counter()
+        for process in writers:
+            process.start()
+        write_totals = [writes.get() for _ in writers]
+        elapsed = time.perf_counter() - start
+        stop.set()
+        read_totals = [reads.get() for _ in readers]
+        for process in readers + writers:
+            process.join()
+
+    dispensed = sum(done for done, _ in write_totals)
+    print(
+        f"{label:<9} dispenses {dispensed:>5} ({dispensed / elapsed:7.1f}/s), "
+        f"locked {sum(locked for _, locked in write_totals):>4}; "
+        f"admin reads {sum(done for done, _ in read_totals):>5}, "
+        f"locked {sum(locked for _, locked in read_totals):>4}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--operations", type=int, default=200, help="Dispenses per writer.")
+    parser.add_argument("--lots", type=int, default=20)
+    args = parser.parse_args()
+
+    run("defaults", False, args)
+    run("tuned", True, args)
+
+
+if __name__ == "__main__":
+    main()
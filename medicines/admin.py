@@ -1,17 +1,171 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.actions import delete_selected
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.http import HttpResponseRedirect
+from django.urls import reverse
+from django.utils.functional import cached_property
 
-from medicines.models import InventoryItem, InventoryStock, InventoryTransaction
-
-# Register your models here.
-admin.site.register(
+from medicines.models import (
+    REFERENCE_TYPES,
+    ArchivedTransaction,
+    InsufficientStock,
     InventoryItem,
-)
-admin.site.register(
+    InventoryStock,
     InventoryTransaction,
 )
 
+
+def estimated_row_count(model, using):
+    """The planner's row estimate for ``model``'s table, or None if unknown."""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            elif connection.vendor == "sqlite":
+                # Populated by ANALYZE, one row per index (and an idx IS NULL
+                # row only for tables without any); each stat starts with the
+                # rows the index covers. Partial indexes cover fewer, so the
+                # largest is the table's.
+                cursor.execute("SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(row[0])
+    return estimate if estimate >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Skips ``COUNT(*)`` on large unfiltered changelists.
+
+    Filtered or searched lists, and tables the planner thinks are small,
+    still get an exact count.
+    """
+    threshold = 10_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.threshold:
+                return estimate
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 100
+
+
+@admin.register(*REFERENCE_TYPES)
+class ReferenceTypeAdmin(admin.ModelAdmin):
+    list_display = ("label", "value")
+    search_fields = ("label", "value")
+
+
+@admin.register(InventoryItem)
+class InventoryItemAdmin(LargeTableAdmin):
+    list_display = ("item_name", "brand_name", "generic_name", "category", "packaging", "on_hand", "reorder_point")
+    list_filter = ("category",)
+    list_select_related = ("stock_summary", "category", "packaging")
+    search_fields = ("item_name", "brand_name", "generic_name", "=gtin")
+
+    @admin.display(description="On hand", ordering="stock_summary__total")
+    def on_hand(self, obj):
+        # Rows written by bulk_create or raw SQL have no summary until
+        # rebuild_stock_summary runs; count them as empty, as the API does.
+        return getattr(getattr(obj, "stock_summary", None), "total", 0)
+
+
 @admin.register(InventoryStock)
-class InventoryStockAdmin(admin.ModelAdmin):
+class InventoryStockAdmin(LargeTableAdmin):
     list_display = ("item", "expiration_date", "count", "date_of_delivery")
     list_filter = ("expiration_date",)
-    search_fields = ("item__name",)
+    list_select_related = ("item",)
+    search_fields = ("item__item_name", "item__brand_name", "item__generic_name")
+    autocomplete_fields = ("item",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).only(
+            "id", "expiration_date", "count", "date_of_delivery",
+            "item__item_name", "item__brand_name",
+        )
+
+
+@admin.register(InventoryTransaction)
+class InventoryTransactionAdmin(LargeTableAdmin):
+    list_display = ("created_at", "item_stock", "transaction_type", "quantity", "user")
+    list_filter = ("transaction_type",)
+    list_select_related = ("item_stock__item", "user")
+    autocomplete_fields = ("item_stock", "user")
+    ordering = ("-created_at",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).only(
+            "id", "created_at", "transaction_type", "quantity",
+            "item_stock__expiration_date",
+            "item_stock__item__item_name", "item_stock__item__brand_name",
+            "user__email",
+        )
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        if "delete_selected" in actions:
+            _, name, description = actions["delete_selected"]
+            actions[name] = (type(self).delete_selected_atomically, name, description)
+        return actions
+
+    def delete_selected_atomically(self, request, queryset):
+        # Django's action logs the deletions, deletes and then reports
+        # success; run it in one transaction so a shortfall leaves neither
+        # log entries nor a success message behind.
+        try:
+            with transaction.atomic():
+                return delete_selected(self, request, queryset)
+        except InsufficientStock as exc:
+            self.message_user(request, f"Nothing was deleted: {exc}.", messages.ERROR)
+
+    def delete_queryset(self, request, queryset):
+        # Bulk deletes skip InventoryTransaction.delete; go one by one so
+        # each transaction's stock effect is reverted, all or none of them.
+        with transaction.atomic():
+            for posting in queryset:
+                posting.delete()
+
+    def delete_view(self, request, object_id, extra_context=None):
+        # Outside the view's own transaction, so its deletion log entry is
+        # rolled back with the failed reversal.
+        try:
+            return super().delete_view(request, object_id, extra_context)
+        except InsufficientStock as exc:
+            self.message_user(request, f"The transaction was not deleted: {exc}.", messages.ERROR)
+            return HttpResponseRedirect(
+                reverse("admin:medicines_inventorytransaction_change", args=[object_id])
+            )
+
+
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(LargeTableAdmin):
+    """Browse-only: archived history is never edited or removed here."""
+    # Ids rather than related rows: the archive may outlive them.
+    list_display = ("created_at", "item_id", "item_stock_id", "transaction_type", "quantity", "user_id")
+    list_filter = ("transaction_type",)
+    ordering = ("-created_at",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
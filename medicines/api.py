@@ -0,0 +1,247 @@
+"""
+JSON API for tills and other machine clients.
+
+The views are async: reads go through the async ORM and never hold a
+worker thread while they wait on the database, so one ASGI process can
+serve many slow clients. Stock writes keep the synchronous, atomic
+services and run them with ``sync_to_async(thread_sensitive=True)``,
+which serialises them on one thread per process, the same thread the
+async ORM uses.
+
+Clients authenticate with a staff session and send the CSRF token on
+POSTs, like any other form in the site.
+"""
+import datetime
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+
+from medicines import catalogue, services
+from medicines.models import (
+    ArchivedTransaction,
+    InsufficientStock,
+    InventoryItem,
+    InventoryStock,
+    StockSnapshot,
+    day_start,
+    normalise_gtin,
+)
+
+ITEM_FIELDS = {
+    "id": "id",
+    "category": "category__value",
+    "subcategory": "subcategory__value",
+    "item_name": "item_name",
+    "brand_name": "brand_name",
+    "generic_name": "generic_name",
+    "dosage_form": "dosage_form",
+    "strength_per_size": "strength_per_size",
+    "packaging": "packaging__value",
+    "quantity": "quantity",
+    "unit_size": "unit_size__value",
+    "gtin": "gtin",
+    "on_hand": "stock_summary__total",
+    "expired": "stock_summary__expired",
+}
+LOT_FIELDS = ("id", "expiration_date", "date_of_delivery", "count")
+ARCHIVE_FIELDS = ("id", "item_stock_id", "user_id", "quantity", "transaction_type", "created_at", "archived_at")
+# A full basket, with room to spare.
+MAX_GTINS = 500
+ARCHIVE_PAGE_SIZE = 500
+
+
+def error(message, status):
+    return JsonResponse({"error": message}, status=status)
+
+
+def api_view(view):
+    """Staff-only JSON view; maps the usual failures onto status codes."""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not (user.is_active and user.is_staff):
+            return error("Staff login required", 403)
+        try:
+            return await view(request, user, *args, **kwargs)
+        except ObjectDoesNotExist:
+            return error("Not found", 404)
+        except InsufficientStock as exc:
+            return error(str(exc), 409)
+        except ValidationError as exc:
+            return error(" ".join(exc.messages), 400)
+        except ValueError as exc:
+            return error(str(exc), 400)
+
+    return wrapper
+
+
+def json_body(request):
+    try:
+        body = json.loads(request.body)
+    except ValueError:
+        raise ValueError("Body must be JSON")
+    if not isinstance(body, dict):
+        raise ValueError("Body must be a JSON object")
+    return body
+
+
+def positive_quantity(body):
+    quantity = body.get("quantity")
+    if type(quantity) is not int or quantity <= 0:
+        raise ValueError("quantity must be a positive integer")
+    return quantity
+
+
+@require_GET
+@api_view
+async def item_detail(request, user, item_id):
+    """The catalogue record for one item with its on-hand totals."""
+    row = await InventoryItem.objects.values_list(*ITEM_FIELDS.values()).aget(pk=item_id)
+    record = dict(zip(ITEM_FIELDS, row))
+    record["on_hand"] = record["on_hand"] or 0
+    record["sellable"] = record["on_hand"] - (record.pop("expired") or 0)
+    return JsonResponse(record)
+
+
+@require_POST
+@api_view
+async def gtin_lookup(request, user):
+    """
+    Resolve a basket of scanned barcodes in one request:
+    ``{"gtins": ["4006381333931", ...]}``. Items come back keyed by the
+    code as sent; codes that are malformed or match no item are listed.
+    """
+    codes = json_body(request).get("gtins")
+    if not isinstance(codes, list) or not all(isinstance(code, str) for code in codes):
+        raise ValueError("gtins must be a list of strings")
+    if len(codes) > MAX_GTINS:
+        raise ValueError(f"At most {MAX_GTINS} gtins per request")
+    normalised, invalid = {}, []
+    for code in codes:
+        try:
+            normalised[code] = normalise_gtin(code)
+        except ValidationError:
+            invalid.append(code)
+    found = await sync_to_async(catalogue.by_gtin)(set(normalised.values()))
+    return JsonResponse({
+        "items": {code: found[gtin] for code, gtin in normalised.items() if gtin in found},
+        "missing": [code for code, gtin in normalised.items() if gtin not in found],
+        "invalid": invalid,
+    })
+
+
+@require_GET
+@api_view
+async def item_lots(request, user, item_id):
+    """Lots of one item that still hold stock, first expiry first."""
+    today = datetime.date.today()
+    lots = [
+        dict(lot, expired=lot["expiration_date"] < today)
+        async for lot in InventoryStock.objects.filter(item_id=item_id, count__gt=0)
+        .order_by("expiration_date")
+        .values(*LOT_FIELDS)
+        .aiterator(chunk_size=200)
+    ]
+    # An empty list is ambiguous; only then is it worth asking whether the
+    # item exists at all.
+    if not lots and not await InventoryItem.objects.filter(pk=item_id).aexists():
+        raise InventoryItem.DoesNotExist
+    return JsonResponse({"item": item_id, "lots": lots})
+
+
+@require_GET
+@api_view
+async def item_stock_as_of(request, user, item_id):
+    """Lot balances at the close of ``?date=YYYY-MM-DD``, for audits."""
+    try:
+        date = datetime.date.fromisoformat(request.GET.get("date", ""))
+    except ValueError:
+        raise ValueError("date must be an ISO date")
+    item = await InventoryItem.objects.only("pk").aget(pk=item_id)
+    balances = await sync_to_async(StockSnapshot.objects.item_balances_as_of)(item, date)
+    return JsonResponse({
+        "item": item_id,
+        "date": date,
+        "quantity": sum(balances.values()),
+        "lots": [{"id": pk, "balance": balance} for pk, balance in sorted(balances.items()) if balance],
+    })
+
+
+@require_GET
+@api_view
+async def item_archive(request, user, item_id):
+    """
+    Archived transactions of one item, oldest first, filtered to
+    ``?since=`` / ``?until=`` dates (inclusive). Pages hold up to
+    ``ARCHIVE_PAGE_SIZE`` rows; pass the returned ``next`` id back as
+    ``?after=`` for the following page.
+    """
+    rows = ArchivedTransaction.objects.filter(item_id=item_id)
+    try:
+        if since := request.GET.get("since"):
+            rows = rows.filter(created_at__gte=day_start(datetime.date.fromisoformat(since)))
+        if until := request.GET.get("until"):
+            next_day = datetime.date.fromisoformat(until) + datetime.timedelta(days=1)
+            rows = rows.filter(created_at__lt=day_start(next_day))
+        after = int(request.GET.get("after", 0))
+    except ValueError:
+        raise ValueError("since and until must be ISO dates and after a transaction id")
+    if after:
+        # Keyset on (created_at, id), anchored at the last row sent.
+        created_at = await rows.values_list("created_at", flat=True).aget(pk=after)
+        rows = rows.filter(created_at__gte=created_at).exclude(created_at=created_at, id__lte=after)
+    page = [
+        row
+        async for row in rows.order_by("created_at", "id")
+        .values(*ARCHIVE_FIELDS)[:ARCHIVE_PAGE_SIZE]
+        .aiterator()
+    ]
+    last = page[-1] if len(page) == ARCHIVE_PAGE_SIZE else None
+    return JsonResponse({
+        "item": item_id,
+        "transactions": page,
+        "next": last["id"] if last else None,
+    })
+
+
+@require_POST
+@api_view
+async def receive(request, user, item_id):
+    """Book a delivery: ``{"quantity": 10, "expiration_date": "2027-01-31"}``."""
+    body = json_body(request)
+    quantity = positive_quantity(body)
+    try:
+        expiration_date = datetime.date.fromisoformat(body.get("expiration_date"))
+    except (TypeError, ValueError):
+        raise ValueError("expiration_date must be an ISO date")
+    item = await InventoryItem.objects.only("pk").aget(pk=item_id)
+    posted = await sync_to_async(services.receive, thread_sensitive=True)(
+        item, quantity, expiration_date, user
+    )
+    return JsonResponse(
+        {"transaction": posted.pk, "lot": posted.item_stock_id, "quantity": posted.quantity},
+        status=201,
+    )
+
+
+@require_POST
+@api_view
+async def dispense(request, user, item_id):
+    """Dispense first-expiry-first-out: ``{"quantity": 2}``."""
+    quantity = positive_quantity(json_body(request))
+    item = await InventoryItem.objects.only("pk").aget(pk=item_id)
+    postings = await sync_to_async(services.dispense, thread_sensitive=True)(item, quantity, user)
+    return JsonResponse(
+        {
+            "quantity": quantity,
+            "transactions": [
+                {"transaction": posted.pk, "lot": posted.item_stock_id, "quantity": posted.quantity}
+                for posted in postings
+            ],
+        },
+        status=201,
+    )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MedicinesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'medicines'
+
+    def ready(self):
+        from medicines import catalogue  # noqa: F401 Connects the invalidation signals.
@@ -0,0 +1,180 @@
+"""
+Read-through cache of catalogue records.
+
+Items are cached as plain dicts, one key per item and one per category
+listing, under the ``catalogue`` cache alias. Every key embeds the current
+catalogue version; saving or deleting any item bumps the version, which
+orphans every cached record in one write. Orphans are never read again and
+expire on their own.
+
+The version is a ``Counter`` row in the database, so a bump in one process
+is seen by every other at its next request, whatever the cache backend.
+It is read once per request; outside requests every call reads it.
+"""
+import contextvars
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from medicines.models import ITEM_CHOICES, Category, Counter, InventoryItem
+
+CACHE_ALIAS = "catalogue"
+VERSION_COUNTER = "catalogue_version"
+UNREAD = -1
+# The version read in the current request: None outside a request, UNREAD
+# in a request that has not read it yet.
+request_version = contextvars.ContextVar("catalogue_request_version", default=None)
+FIELDS = (
+    "id",
+    "category",
+    "subcategory",
+    "item_name",
+    "brand_name",
+    "generic_name",
+    "dosage_form",
+    "strength_per_size",
+    "packaging",
+    "quantity",
+    "unit_size",
+    "gtin",
+)
+
+
+def records(queryset):
+    """Plain dicts for ``queryset``, with reference ids swapped for their values."""
+    rows = list(queryset.values(*FIELDS))
+    for row in rows:
+        for field, model in ITEM_CHOICES.items():
+            row[field] = model.objects.by_id(row[field]).value
+    return rows
+
+
+def cache():
+    return caches[CACHE_ALIAS]
+
+
+def timeout():
+    return getattr(settings, "CATALOGUE_CACHE_TIMEOUT", 24 * 3600)
+
+
+def version():
+    current = request_version.get()
+    if current is not None and current != UNREAD:
+        return current
+    in_request = current is not None
+    current = Counter.objects.value_of(VERSION_COUNTER)
+    if in_request:
+        request_version.set(current)
+    return current
+
+
+def invalidate():
+    """Retire every cached record by moving to a new version."""
+    Counter.objects.bump(VERSION_COUNTER)
+    if request_version.get() is not None:
+        request_version.set(UNREAD)
+
+
+@receiver(request_started, dispatch_uid="catalogue_request_started")
+def start_request(**kwargs):
+    request_version.set(UNREAD)
+
+
+@receiver(request_finished, dispatch_uid="catalogue_request_finished")
+def finish_request(**kwargs):
+    request_version.set(None)
+
+
+def item_key(pk, current):
+    return f"catalogue:v{current}:item:{pk}"
+
+
+def gtin_key(gtin, current):
+    return f"catalogue:v{current}:gtin:{gtin}"
+
+
+def category_key(category, current):
+    return f"catalogue:v{current}:category:{category}"
+
+
+def item(pk):
+    """The catalogue record for ``pk``, or None if there is no such item."""
+    return next(iter(items([pk]).values()), None)
+
+
+def items(pks):
+    """
+    Records for ``pks`` keyed by id text; one cache round trip, one query
+    for misses. Ids with no item are cached as None so they stay cheap too.
+    """
+    current = version()
+    keys = {}
+    for pk in pks:
+        try:
+            pk = str(uuid.UUID(str(pk)))
+        except ValueError:
+            continue  # Not an id any item could have.
+        keys[item_key(pk, current)] = pk
+    found = {keys[key]: record for key, record in cache().get_many(keys).items()}
+    missing = [pk for pk in keys.values() if pk not in found]
+    if missing:
+        loaded = dict.fromkeys(missing)
+        loaded.update(
+            (str(record["id"]), record)
+            for record in records(InventoryItem.objects.filter(pk__in=missing))
+        )
+        cache().set_many({item_key(pk, current): record for pk, record in loaded.items()}, timeout())
+        found.update(loaded)
+    return {pk: record for pk, record in found.items() if record is not None}
+
+
+def by_gtin(gtins):
+    """
+    Records for normalised ``gtins`` keyed by GTIN, for resolving a whole
+    basket of scans at once: one cache round trip, and one ``IN`` query
+    for the codes not cached yet. Unknown codes are cached as None.
+    """
+    current = version()
+    keys = {gtin_key(gtin, current): gtin for gtin in gtins}
+    found = {keys[key]: record for key, record in cache().get_many(keys).items()}
+    missing = [gtin for gtin in keys.values() if gtin not in found]
+    if missing:
+        loaded = dict.fromkeys(missing)
+        loaded.update(
+            (record["gtin"], record)
+            for record in records(InventoryItem.objects.filter(gtin__in=missing))
+        )
+        cache().set_many({gtin_key(gtin, current): record for gtin, record in loaded.items()}, timeout())
+        found.update(loaded)
+    return {gtin: record for gtin, record in found.items() if record is not None}
+
+
+def category(name):
+    """Records in category ``name``, ordered by item name."""
+    try:
+        category_id = Category.objects.get_for(name).pk
+    except ValidationError:
+        return []
+    current = version()
+    key = category_key(category_id, current)
+    listing = cache().get(key)
+    if listing is None:
+        listing = records(
+            InventoryItem.objects.filter(category_id=category_id).order_by("item_name", "pk")
+        )
+        cache().set(key, listing, timeout())
+    return listing
+
+
+@receiver(post_save, sender=InventoryItem, dispatch_uid="catalogue_item_saved")
+@receiver(post_delete, sender=InventoryItem, dispatch_uid="catalogue_item_deleted")
+def item_changed(sender, **kwargs):
+    # Bump after commit; bumping earlier would let a concurrent read cache
+    # the old row under the new version.
+    transaction.on_commit(invalidate)
@@ -0,0 +1,27 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from medicines.models import ArchivedTransaction, day_start
+
+
+class Command(BaseCommand):
+    help = "Move transactions past the archive horizon into the archive table, in bounded chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=settings.TRANSACTION_ARCHIVE_DAYS,
+            help="Archive transactions from days before this many days ago (default TRANSACTION_ARCHIVE_DAYS).",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, older_than_days, batch_size, **options):
+        if older_than_days <= 0:
+            raise CommandError("--older-than-days must be positive.")
+        cutoff = timezone.localdate() - datetime.timedelta(days=older_than_days)
+        moved = ArchivedTransaction.objects.archive(day_start(cutoff), batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} transactions from before {cutoff}."))
@@ -0,0 +1,29 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from medicines.models import StockMovement, StockSnapshot
+
+
+class Command(BaseCommand):
+    help = "Roll the stock ledger up into daily snapshots and drop old movements."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=90,
+            help="Keep individual movements for this many days; older ones survive only as snapshots.",
+        )
+        parser.add_argument("--batch-size", type=int, default=10_000)
+
+    def handle(self, *args, keep_days, batch_size, **options):
+        today = timezone.localdate()
+        written = StockSnapshot.objects.roll_up(today - datetime.timedelta(days=1))
+        self.stdout.write(f"Wrote {written} snapshots.")
+        if keep_days > 0:
+            deleted = StockMovement.objects.compact(
+                today - datetime.timedelta(days=keep_days), batch_size=batch_size
+            )
+            self.stdout.write(self.style.SUCCESS(f"Compacted {deleted} movements."))
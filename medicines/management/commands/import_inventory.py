@@ -0,0 +1,193 @@
+import csv
+import itertools
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+
+from medicines import catalogue
+from medicines.models import ITEM_CHOICES, InventoryItem, StockSummary, UnitType, normalise_gtin
+
+# Items without an ``id`` column get a stable id derived from these, so
+# re-importing the same supplier file updates rather than duplicates.
+NATURAL_KEY = ("brand_name", "item_name", "strength_per_size", "packaging")
+ITEM_NAMESPACE = uuid.UUID("6f1c3b52-8f3e-4c55-9a51-2f5c8b0f4d11")
+
+TEXT_FIELDS = ("item_name", "brand_name", "generic_name", "dosage_form", "strength_per_size")
+UPDATE_FIELDS = [
+    "category", "subcategory", "item_name", "brand_name", "generic_name",
+    "dosage_form", "strength_per_size", "packaging", "quantity", "unit_size",
+]
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as handle:
+        yield from csv.DictReader(handle)
+
+
+def read_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise CommandError("Reading .xlsx files needs openpyxl installed.")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() for cell in next(rows, ())]
+        for values in rows:
+            yield {
+                name: "" if value is None else str(value)
+                for name, value in zip(header, values)
+            }
+    finally:
+        workbook.close()
+
+
+class Command(BaseCommand):
+    help = "Import catalogue items from a supplier CSV or XLSX file, upserting in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, path, batch_size, **options):
+        match path.suffix.lower():
+            case ".csv":
+                rows = read_csv(path)
+            case ".xlsx":
+                rows = read_xlsx(path)
+            case _:
+                raise CommandError(f"Unsupported file type: {path.suffix}")
+
+        self.max_lengths = {
+            name: InventoryItem._meta.get_field(name).max_length for name in TEXT_FIELDS
+        }
+
+        # Every row read ends up imported, failed or merged into a later row
+        # for the same item.
+        read = imported = failed = merged = 0
+        # Data rows start on line 2, after the header.
+        numbered = enumerate(rows, start=2)
+        while chunk := list(itertools.islice(numbered, batch_size)):
+            read += len(chunk)
+            items = {}
+            duplicates = 0
+            for line, row in chunk:
+                try:
+                    item = self.build_item(row)
+                except ValidationError as error:
+                    failed += 1
+                    self.stderr.write(f"line {line}: {'; '.join(error.messages)}")
+                    continue
+                duplicates += item.pk in items
+                items[item.pk] = (line, item)  # Last occurrence of an item wins.
+            # Only files with a gtin column set barcodes; others leave them be.
+            fields = UPDATE_FIELDS
+            if any("gtin" in row for _, row in chunk):
+                fields = UPDATE_FIELDS + ["gtin"]
+                failed += self.reject_duplicate_gtins(items)
+            try:
+                self.upsert([item for _, item in items.values()], fields)
+            except DatabaseError as error:
+                failed += len(items) + duplicates
+                self.stderr.write(f"lines {chunk[0][0]}-{chunk[-1][0]}: {error}")
+                continue
+            imported += len(items)
+            merged += duplicates
+
+        if imported:
+            # bulk_create sends no post_save, so retire cached records here.
+            transaction.on_commit(catalogue.invalidate)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} items, {failed} rows failed, "
+            f"{merged} duplicate rows merged ({read} rows read)."
+        ))
+
+    def build_item(self, row):
+        values = {name: (row.get(name) or "").strip() for name in UPDATE_FIELDS}
+        errors = []
+        # Accept values or labels in any casing, as rows of the cached
+        # reference tables.
+        for name, model in ITEM_CHOICES.items():
+            if values[name] == "" and name == "unit_size":
+                values[name] = UnitType.EACH
+            try:
+                values[name] = model.objects.lookup(values[name])
+            except ValidationError as error:
+                errors.extend(error.messages)
+        for name, max_length in self.max_lengths.items():
+            if name != "strength_per_size" and not values[name]:
+                errors.append(f"Missing {name}")
+            elif len(values[name]) > max_length:
+                errors.append(f"{name} longer than {max_length} characters")
+        try:
+            values["quantity"] = int(values["quantity"])
+        except ValueError:
+            errors.append(f"Invalid quantity: {values['quantity']!r}")
+        item_id = None
+        if given_id := (row.get("id") or "").strip():
+            try:
+                item_id = uuid.UUID(given_id)
+            except ValueError:
+                errors.append(f"Invalid id: {given_id!r}")
+        gtin = (row.get("gtin") or "").strip()
+        try:
+            values["gtin"] = normalise_gtin(gtin) if gtin else None
+        except ValidationError as error:
+            errors.extend(error.messages)
+        if errors:
+            raise ValidationError(errors)
+
+        values["strength_per_size"] = values["strength_per_size"] or None
+        item_id = item_id or uuid.uuid5(
+            ITEM_NAMESPACE,
+            "|".join(str(getattr(values[name], "value", values[name])) for name in NATURAL_KEY),
+        )
+        return InventoryItem(id=item_id, **values)
+
+    def reject_duplicate_gtins(self, items):
+        """
+        Drop rows whose GTIN another item in the chunk or in the catalogue
+        already has, so one clash cannot fail the whole chunk's upsert.
+        Returns the number of rows dropped.
+        """
+        lines = defaultdict(list)
+        for pk, (line, item) in items.items():
+            if item.gtin:
+                lines[item.gtin].append((line, pk))
+        held = dict(
+            InventoryItem.objects.filter(gtin__in=lines).values_list("gtin", "pk")
+        )
+        rejected = 0
+        for gtin, rows in lines.items():
+            for line, pk in rows:
+                # The item already holding the code keeps it; with no holder
+                # there is no telling which of the repeats is right.
+                if gtin in held:
+                    if held[gtin] == pk:
+                        continue
+                    self.stderr.write(f"line {line}: GTIN {gtin} already belongs to item {held[gtin]}")
+                elif len(rows) > 1:
+                    others = ", ".join(str(other) for other, _ in rows if other != line)
+                    self.stderr.write(f"line {line}: GTIN {gtin} is also on line {others}")
+                else:
+                    continue
+                del items[pk]
+                rejected += 1
+        return rejected
+
+    @transaction.atomic
+    def upsert(self, items, fields=UPDATE_FIELDS):
+        InventoryItem.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=["id"],
+            update_fields=fields,
+        )
+        StockSummary.objects.bulk_create(
+            [StockSummary(item_id=item.pk) for item in items],
+            ignore_conflicts=True,
+        )
@@ -0,0 +1,35 @@
+import dataclasses
+import json
+
+from django.core.management.base import BaseCommand
+
+from medicines import reports
+
+
+class Command(BaseCommand):
+    help = "Print the expiry-per-category and days-of-cover reports."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--weeks", type=int, default=12, help="Expiry horizon in weeks.")
+        parser.add_argument("--window", type=int, default=30, help="Consumption window in days.")
+        parser.add_argument("--json", action="store_true", help="Emit one JSON document instead of tables.")
+
+    def handle(self, *args, weeks, window, **options):
+        expiry = reports.expiry_by_category_week(weeks=weeks)
+        cover = reports.days_of_cover(window_days=window)
+
+        if options["json"]:
+            self.stdout.write(json.dumps({
+                "expiry": [row._asdict() for row in expiry],
+                "cover": [dataclasses.asdict(row) for row in cover],
+            }, default=str))
+            return
+
+        self.stdout.write(f"Expiring per category per week (next {weeks} weeks)")
+        for row in expiry:
+            self.stdout.write(f"{row.week}  {row.category:<45} {row.quantity:>8}")
+        self.stdout.write("")
+        self.stdout.write(f"Days of cover ({window}-day consumption)")
+        for row in cover:
+            days = "-" if row.days_of_cover is None else f"{row.days_of_cover:.1f}"
+            self.stdout.write(f"{row.item_name:<40} {row.sellable:>8} {row.daily_rate:>8.2f} {days:>8}")
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from medicines import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the SQLite full-text index over the catalogue (run after VACUUM)."
+
+    def handle(self, *args, **options):
+        with connection.schema_editor() as schema_editor:
+            search.rebuild_search_index(schema_editor)
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
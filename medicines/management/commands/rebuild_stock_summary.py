@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from medicines.models import StockSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-item on-hand summaries from the lot rows, or verify them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only report summaries that disagree with the lots; change nothing.",
+        )
+
+    def handle(self, *args, verify=False, **options):
+        if verify:
+            mismatched = StockSummary.objects.mismatched().values_list(
+                "item_id", "total", "lot_total", "expired", "lot_expired"
+            )
+            drift = 0
+            for item_id, total, lot_total, expired, lot_expired in mismatched.iterator():
+                drift += 1
+                self.stdout.write(
+                    f"{item_id}: total {total} != {lot_total} or expired {expired} != {lot_expired}"
+                )
+            if drift:
+                raise CommandError(f"{drift} summaries out of step with their lots.")
+            self.stdout.write(self.style.SUCCESS("All summaries match their lots."))
+            return
+
+        rebuilt = StockSummary.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} summaries."))
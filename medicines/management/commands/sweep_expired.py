@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from medicines.services import unswept_lots, write_off_expired
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Write off stock in lots that expired since the last sweep; cheap enough to run every few minutes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Check every expired lot, not just those since the last sweep.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be written off; change nothing.",
+        )
+
+    def handle(self, *args, batch_size, full, dry_run, **options):
+        if dry_run:
+            pending = unswept_lots(full=full).aggregate(lots=Count("pk"), quantity=Sum("count"))
+            self.stdout.write(
+                f"Would write off {pending['quantity'] or 0} units in {pending['lots']} expired lots."
+            )
+            return
+        lots, quantity = write_off_expired(
+            CustomUser.objects.system_user(), batch_size=batch_size, full=full
+        )
+        self.stdout.write(self.style.SUCCESS(f"Wrote off {quantity} units in {lots} expired lots."))
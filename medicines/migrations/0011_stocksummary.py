@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:39
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Q, Sum
+
+
+def backfill_summaries(apps, schema_editor):
+    InventoryItem = apps.get_model('medicines', 'InventoryItem')
+    StockSummary = apps.get_model('medicines', 'StockSummary')
+    today = datetime.date.today()
+    items = InventoryItem.objects.annotate(
+        lot_total=Sum('inventorystock__count'),
+        lot_expired=Sum('inventorystock__count', filter=Q(inventorystock__expiration_date__lt=today)),
+    ).values_list('pk', 'lot_total', 'lot_expired')
+    StockSummary.objects.bulk_create(
+        (
+            StockSummary(item_id=pk, total=total or 0, expired=expired or 0, as_of=today)
+            for pk, total, expired in items.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0010_alter_inventoryitem_packaging'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSummary',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_summary', serialize=False, to='medicines.inventoryitem')),
+                ('total', models.IntegerField(default=0)),
+                ('expired', models.IntegerField(default=0)),
+                ('as_of', models.DateField(default=datetime.date.today)),
+            ],
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
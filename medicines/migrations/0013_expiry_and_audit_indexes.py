@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0012_inventorytransaction_created_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorystock',
+            index=models.Index(condition=models.Q(('count__gt', 0)), fields=['expiration_date'], name='stock_expiring_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorystock',
+            index=models.Index(fields=['item', 'expiration_date', 'count'], name='stock_item_expiry_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['user', 'created_at'], name='transaction_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from medicines import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0014_transaction_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
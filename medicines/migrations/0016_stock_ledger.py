@@ -0,0 +1,61 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    # Each existing lot opens the ledger with its current count.
+    InventoryStock = apps.get_model('medicines', 'InventoryStock')
+    StockMovement = apps.get_model('medicines', 'StockMovement')
+    now = django.utils.timezone.now()
+    StockMovement.objects.bulk_create(
+        (
+            StockMovement(stock_id=pk, delta=count, created_at=now)
+            for pk, count in InventoryStock.objects.exclude(count=0).values_list('pk', 'count').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0015_inventoryitem_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Watermark',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='medicines.inventorystock')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['stock', 'created_at'], name='movement_stock_created_idx'), models.Index(fields=['created_at'], name='movement_created_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('balance', models.IntegerField()),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='medicines.inventorystock')),
+            ],
+            options={
+                'unique_together': {('stock', 'date')},
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:03
+
+import uuid
+from django.db import migrations, models
+
+from medicines import search
+
+# Ids that were never UUIDs get a stable one derived from the old text.
+LEGACY_NAMESPACE = uuid.UUID('0b7f5f0e-3c1d-4f0a-9d2e-6a4b8c1e2f30')
+
+
+def create_search_index(apps, schema_editor):
+    search.create_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_search_index(schema_editor)
+
+
+def normalise_ids(apps, schema_editor):
+    """
+    Rewrite every item id, and the lot and summary rows pointing at it, into
+    the form UUIDField stores: 32 hex digits on SQLite, which keeps text
+    columns, and the canonical text that casts to uuid on PostgreSQL.
+    """
+    InventoryItem = apps.get_model('medicines', 'InventoryItem')
+    InventoryStock = apps.get_model('medicines', 'InventoryStock')
+    StockSummary = apps.get_model('medicines', 'StockSummary')
+    native = schema_editor.connection.features.has_native_uuid_field
+
+    for old in list(InventoryItem.objects.values_list('pk', flat=True)):
+        try:
+            value = uuid.UUID(old)
+        except ValueError:
+            value = uuid.uuid5(LEGACY_NAMESPACE, old)
+        new = str(value) if native else value.hex
+        if new == old:
+            continue
+        InventoryItem.objects.filter(id=old).update(id=new)
+        InventoryStock.objects.filter(item_id=old).update(item_id=new)
+        StockSummary.objects.filter(item_id=old).update(item_id=new)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0016_stock_ledger'),
+    ]
+
+    operations = [
+        # Changing the key remakes the catalogue table on SQLite, which drops
+        # the search triggers and renumbers the rowids the index points at.
+        migrations.RunPython(drop_search_index, create_search_index),
+        migrations.RunPython(normalise_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='id',
+            field=models.UUIDField(default=uuid.uuid4, primary_key=True, serialize=False),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,206 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:08
+
+import django.db.models.deletion
+import medicines.models
+from django.db import migrations, models
+
+from medicines import search
+from medicines.models import CategoryType, PackagingType, SubcategoryType, UnitType
+
+# (reference model, InventoryItem field, seed enum)
+REFERENCES = (
+    ('Category', 'category', CategoryType),
+    ('Subcategory', 'subcategory', SubcategoryType),
+    ('Packaging', 'packaging', PackagingType),
+    ('Unit', 'unit_size', UnitType),
+)
+
+
+def create_search_index(apps, schema_editor):
+    search.create_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_search_index(schema_editor)
+
+
+def seed_references(apps, schema_editor):
+    """
+    Fill each table from its enum, plus any value items hold that the enum
+    does not know about, so every existing row converts.
+    """
+    InventoryItem = apps.get_model('medicines', 'InventoryItem')
+    for model_name, field, choices in REFERENCES:
+        model = apps.get_model('medicines', model_name)
+        rows = {value: label for value, label in choices.choices}
+        for value in InventoryItem.objects.values_list(field, flat=True).distinct():
+            rows.setdefault(value, value)
+        model.objects.bulk_create(model(value=value, label=label) for value, label in rows.items())
+
+
+def point_items_at_references(apps, schema_editor):
+    InventoryItem = apps.get_model('medicines', 'InventoryItem')
+    for model_name, field, _ in REFERENCES:
+        model = apps.get_model('medicines', model_name)
+        for pk, value in model.objects.values_list('pk', 'value'):
+            InventoryItem.objects.filter(**{field: value}).update(**{f'{field}_ref': pk})
+
+
+def point_items_at_values(apps, schema_editor):
+    InventoryItem = apps.get_model('medicines', 'InventoryItem')
+    for model_name, field, _ in REFERENCES:
+        model = apps.get_model('medicines', model_name)
+        for pk, value in model.objects.values_list('pk', 'value'):
+            InventoryItem.objects.filter(**{f'{field}_ref': pk}).update(**{field: value})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0017_inventoryitem_uuid_pk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('value', models.CharField(max_length=64, unique=True)),
+                ('label', models.CharField(max_length=64)),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'ordering': ('label',),
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Packaging',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('value', models.CharField(max_length=64, unique=True)),
+                ('label', models.CharField(max_length=64)),
+            ],
+            options={
+                'ordering': ('label',),
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Subcategory',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('value', models.CharField(max_length=64, unique=True)),
+                ('label', models.CharField(max_length=64)),
+            ],
+            options={
+                'verbose_name_plural': 'subcategories',
+                'ordering': ('label',),
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Unit',
+            fields=[
+                ('id', models.SmallAutoField(primary_key=True, serialize=False)),
+                ('value', models.CharField(max_length=64, unique=True)),
+                ('label', models.CharField(max_length=64)),
+            ],
+            options={
+                'ordering': ('label',),
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(seed_references, migrations.RunPython.noop),
+        # Swapping the columns remakes the catalogue table on SQLite; see 0017.
+        migrations.RunPython(drop_search_index, create_search_index),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='category_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='medicines.category'),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='subcategory_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='medicines.subcategory'),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='packaging_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='medicines.packaging'),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='unit_size_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='medicines.unit'),
+        ),
+        # Lets the reverse direction re-add these text columns to a full table.
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='subcategory',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='packaging',
+            field=models.CharField(max_length=32, null=True),
+        ),
+        migrations.RunPython(point_items_at_references, point_items_at_values),
+        migrations.RemoveField(
+            model_name='inventoryitem',
+            name='category',
+        ),
+        migrations.RemoveField(
+            model_name='inventoryitem',
+            name='subcategory',
+        ),
+        migrations.RemoveField(
+            model_name='inventoryitem',
+            name='packaging',
+        ),
+        migrations.RemoveField(
+            model_name='inventoryitem',
+            name='unit_size',
+        ),
+        migrations.RenameField(
+            model_name='inventoryitem',
+            old_name='category_ref',
+            new_name='category',
+        ),
+        migrations.RenameField(
+            model_name='inventoryitem',
+            old_name='subcategory_ref',
+            new_name='subcategory',
+        ),
+        migrations.RenameField(
+            model_name='inventoryitem',
+            old_name='packaging_ref',
+            new_name='packaging',
+        ),
+        migrations.RenameField(
+            model_name='inventoryitem',
+            old_name='unit_size_ref',
+            new_name='unit_size',
+        ),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='category',
+            field=models.ForeignKey(default=medicines.models.default_category, on_delete=django.db.models.deletion.PROTECT, to='medicines.category'),
+        ),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='packaging',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='medicines.packaging'),
+        ),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='subcategory',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='medicines.subcategory'),
+        ),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='unit_size',
+            field=models.ForeignKey(default=medicines.models.default_unit, on_delete=django.db.models.deletion.PROTECT, to='medicines.unit'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
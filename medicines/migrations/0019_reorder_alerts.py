@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0018_reference_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='reorder_point',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ReorderAlert',
+            fields=[
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='reorder_alert', serialize=False, to='medicines.inventoryitem')),
+                ('sellable', models.IntegerField()),
+                ('reorder_point', models.PositiveIntegerField()),
+                ('shortfall', models.IntegerField()),
+                ('since', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-shortfall'], name='reorder_alert_shortfall_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:17
+
+from django.db import migrations, models
+
+from medicines import search
+
+
+def create_search_index(apps, schema_editor):
+    search.create_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0019_reorder_alerts'),
+    ]
+
+    operations = [
+        # SQLite cannot add a UNIQUE column in place, so this remakes the
+        # catalogue table; rebuild the search index around it.
+        migrations.RunPython(drop_search_index, create_search_index),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='gtin',
+            field=models.CharField(blank=True, max_length=14, null=True, unique=True, verbose_name='GTIN'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0020_inventoryitem_gtin'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorytransaction',
+            name='transaction_type',
+            field=models.CharField(choices=[('add', 'Add'), ('remove', 'Remove'), ('write_off', 'Write-off')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0022_transaction_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='stock',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='movements', to='medicines.inventorystock'),
+        ),
+        migrations.AlterField(
+            model_name='stocksnapshot',
+            name='stock',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='snapshots', to='medicines.inventorystock'),
+        ),
+        migrations.CreateModel(
+            name='RetiredLot',
+            fields=[
+                ('stock_id', models.IntegerField(primary_key=True, serialize=False)),
+                ('retired_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='medicines.inventoryitem')),
+            ],
+        ),
+    ]
@@ -1,9 +1,16 @@
 import datetime
+import functools
+import itertools
 import uuid
 import django
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from collections import defaultdict
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.lookups import GreaterThanOrEqual
+from django.db.models.signals import post_delete, post_save
 from django.forms import ValidationError
 
 User = get_user_model()
@@ -116,46 +123,299 @@ class PackagingType(models.TextChoices):
     THIRTY_PER_BOTTLE = "30_per_bottle", "30's per bottle"
     SIXTY_PER_BOTTLE = "60_per_bottle", "60's per bottle"
 
+# The enums above seed the reference tables below; they are not the full
+# set of values, since rows can be added without a deploy.
+
+class ReferenceManager(models.Manager):
+    """
+    Serves a small reference table from an in-process cache.
+
+    The whole table is read on first use and again after any row changes in
+    this process. A value another process has just added is picked up by
+    reloading once on a miss.
+    """
+
+    def load(self):
+        rows = list(self.get_queryset())
+        by_value = {row.value: row for row in rows}
+        lookup = {}
+        for row in rows:
+            lookup[row.value.casefold()] = row
+            lookup[row.label.casefold()] = row
+        self.__dict__["_cache"] = {
+            "by_id": {row.pk: row for row in rows},
+            "by_value": by_value,
+            "lookup": lookup,
+        }
+        return self.__dict__["_cache"]
+
+    def clear_cache(self):
+        self.__dict__.pop("_cache", None)
+
+    def cached(self, index, key):
+        """Row for ``key`` in ``index``; a miss reloads the table once."""
+        cache = self.__dict__.get("_cache") or self.load()
+        row = cache[index].get(key)
+        if row is None and key is not None:
+            row = self.load()[index].get(key)
+        return row
+
+    def by_id(self, pk):
+        return self.cached("by_id", pk)
+
+    def get_for(self, value):
+        """The row for a stored value such as ``CategoryType.ANTACIDS``."""
+        row = self.cached("by_value", value)
+        if row is None:
+            raise ValidationError(f"Invalid {self.model.kind} type: {value}")
+        return row
+
+    def lookup(self, text):
+        """Like ``get_for`` but also accepts labels, in any case."""
+        row = self.cached("lookup", text.casefold())
+        if row is None:
+            raise ValidationError(f"Invalid {self.model.kind} type: {text}")
+        return row
+
+
+class ReferenceType(models.Model):
+    id = models.SmallAutoField(primary_key=True)
+    value = models.CharField(max_length=64, unique=True)
+    label = models.CharField(max_length=64)
+
+    objects = ReferenceManager()
+
+    class Meta:
+        abstract = True
+        ordering = ("label",)
+
+    def __str__(self):
+        return self.label
+
+
+class Category(ReferenceType):
+    kind = "Category"
+    seed = CategoryType
+
+    class Meta(ReferenceType.Meta):
+        verbose_name_plural = "categories"
+
+
+class Subcategory(ReferenceType):
+    kind = "Subcategory"
+    seed = SubcategoryType
+
+    class Meta(ReferenceType.Meta):
+        verbose_name_plural = "subcategories"
+
+
+class Packaging(ReferenceType):
+    kind = "Packaging"
+    seed = PackagingType
+
+
+class Unit(ReferenceType):
+    kind = "unit"
+    seed = UnitType
+
+
+REFERENCE_TYPES = (Category, Subcategory, Packaging, Unit)
+
+
+def reference_changed(sender, **kwargs):
+    sender.objects.clear_cache()
+
+
+for reference_type in REFERENCE_TYPES:
+    post_save.connect(reference_changed, sender=reference_type, dispatch_uid=f"{reference_type.__name__}_saved")
+    post_delete.connect(reference_changed, sender=reference_type, dispatch_uid=f"{reference_type.__name__}_deleted")
+
+# Choice fields of InventoryItem and the reference table behind each.
+ITEM_CHOICES = {
+    "unit_size": Unit,
+    "category": Category,
+    "subcategory": Subcategory,
+    "packaging": Packaging,
+}
+
+def validate_item_choices(values):
+    """
+    Check the reference ids in ``values`` (``{"category": id, ...}``)
+    against the cached tables.
+
+    Shared by ``InventoryItem.clean`` (and so the admin forms) and the
+    catalogue import.
+    """
+    for field, model in ITEM_CHOICES.items():
+        if field in values and model.objects.by_id(values[field]) is None:
+            raise ValidationError({field: f"Invalid {model.kind} type: {values[field]}"})
+
+
+def normalise_gtin(code):
+    """
+    ``code`` as the 14-digit GTIN items store. Shorter EAN-8, UPC-A and
+    EAN-13 codes are left-padded with zeros, so every scan of a product
+    resolves to the same value.
+    """
+    code = str(code).strip()
+    if not code.isdigit() or len(code) not in (8, 12, 13, 14):
+        raise ValidationError(f"Invalid GTIN: {code}")
+    code = code.zfill(14)
+    total = sum(int(digit) * (3 if n % 2 == 0 else 1) for n, digit in enumerate(code[:13]))
+    if (10 - total % 10) % 10 != int(code[13]):
+        raise ValidationError(f"Invalid GTIN check digit: {code}")
+    return code
+
+
+def default_category():
+    return Category.objects.get_for(CategoryType.OTC_MEDICINES).pk
+
+
+def default_unit():
+    return Unit.objects.get_for(UnitType.EACH).pk
+
 # Create your models here.
 class InventoryItem(models.Model):
-    id = models.CharField(primary_key=True, default=uuid.uuid4, max_length=128)
-    category = models.CharField(
-        max_length=64,
-        choices=CategoryType.choices,
-        default=CategoryType.OTC_MEDICINES,
-    )
-    subcategory = models.CharField(
-        max_length=64,
-        choices=SubcategoryType.choices,
-    )
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT, default=default_category)
+    subcategory = models.ForeignKey(Subcategory, on_delete=models.PROTECT)
     item_name = models.CharField(max_length=128)
     brand_name = models.CharField(max_length=128)
     generic_name = models.CharField(max_length=128)
     dosage_form = models.CharField(max_length=32)
     strength_per_size = models.CharField(max_length=32, null=True, default=None)
-    packaging = models.CharField(
-        max_length=32, 
-        choices=PackagingType.choices
-    )
+    packaging = models.ForeignKey(Packaging, on_delete=models.PROTECT)
     quantity = models.IntegerField()
-    unit_size = models.CharField(
-        max_length=16,
-        choices=UnitType.choices,
-        default=UnitType.EACH,
-    )
+    unit_size = models.ForeignKey(Unit, on_delete=models.PROTECT, default=default_unit)
+    # Raise a reorder alert when sellable stock falls below this; blank
+    # for items that are not reordered.
+    reorder_point = models.PositiveIntegerField(null=True, blank=True)
+    # Barcode, stored as GTIN-14; blank for items without one.
+    gtin = models.CharField("GTIN", max_length=14, unique=True, null=True, blank=True)
 
     def clean(self):
-        if self.unit_size not in UnitType.values:
-            raise ValidationError(f"Invalid unit type: {self.unit_size}")
-        if self.category not in CategoryType.values:
-            raise ValidationError(f"Invalid Category type: {self.category}")
-        if self.subcategory not in SubcategoryType.values:
-            raise ValidationError(f"Invalid Subcategory type: {self.subcategory}")
-        if self.packaging not in PackagingType.values:
-            raise ValidationError(f"Invalid Packaging type: {self.packaging}")
+        validate_item_choices({field: getattr(self, f"{field}_id") for field in ITEM_CHOICES})
+        self.gtin = normalise_gtin(self.gtin) if self.gtin else None
+    def __str__(self):
+        return f"{self.item_name} ({self.brand_name})"
+
+    @transaction.atomic
     def save(self, *args, **kwargs):
         self.clean()  # Call validation before saving
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        if adding:
+            StockSummary.objects.bulk_create(
+                [StockSummary(item_id=self.pk)], ignore_conflicts=True
+            )
+        refresh_alerts_on_commit(item_ids=[self.pk])
+
+class StalePosting(Exception):
+    """A transaction row no longer holds the posting an instance loaded."""
+
+
+class InsufficientStock(ValueError):
+    """Raised when a movement would take a lot below zero."""
+
+    def __init__(self, message="Not enough stock available"):
+        super().__init__(message)
+
+
+class InventoryStockQuerySet(models.QuerySet):
+    def adjust_count(self, pk, delta):
+        """
+        Apply ``delta`` to a lot in one conditional UPDATE.
+
+        Removals only match while ``count >= -delta``, so a zero affected-row
+        count means there was not enough stock and nothing was written.
+        """
+        if not delta:
+            return
+        rows = self.filter(pk=pk)
+        if delta < 0:
+            rows = rows.filter(count__gte=-delta)
+        if not rows.update(count=F("count") + delta):
+            raise InsufficientStock()
+
+    def apply_deltas(self, deltas, batch_size=500):
+        """
+        Apply ``{stock_id: delta}`` with one CASE/WHEN UPDATE per batch.
+
+        The UPDATE only matches lots whose new count stays non-negative, so
+        fewer affected rows than lots means the batch is short somewhere.
+        Call it inside a transaction so a shortfall rolls the batch back.
+        Item on-hand summaries are moved by the same deltas, each lot's
+        delta is appended to the movement ledger, and the items' reorder
+        alerts are re-evaluated once the transaction commits.
+        """
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        # Lots are updated in primary key order so concurrent batches touching
+        # the same lots cannot deadlock.
+        ids = sorted(deltas)
+        for start in range(0, len(ids), batch_size):
+            chunk = {pk: deltas[pk] for pk in ids[start:start + batch_size]}
+            if len(chunk) == 1:
+                [(pk, delta)] = chunk.items()
+                self.adjust_count(pk, delta)
+            else:
+                delta = lot_delta(chunk)
+                updated = self.filter(
+                    GreaterThanOrEqual(F("count") + delta, 0),
+                    pk__in=chunk,
+                ).update(count=F("count") + delta)
+                if updated != len(chunk):
+                    raise InsufficientStock()
+            StockSummary.objects.apply_lot_deltas(chunk)
+            StockMovement.objects.record(chunk)
+            refresh_alerts_on_commit(stock_ids=list(chunk))
+
+
+    def lock_for_delete(self):
+        """Lock the lots and return their ``(pk, item_id, count)`` rows."""
+        return list(self.select_for_update().order_by("pk").values_list("pk", "item_id", "count"))
+
+    @transaction.atomic
+    def delete(self):
+        """
+        Bulk deletes (the admin action, ``filter(...).delete()``) skip
+        ``InventoryStock.delete``; do its bookkeeping for the whole set.
+        """
+        lots = self.lock_for_delete()
+        result = super().delete()
+        retire_lots(lots)
+        return result
+
+
+def retire_lots(lots):
+    """
+    Bookkeeping after deleting lots given as ``(pk, item_id, count)`` rows.
+
+    The ledger outlives the lot: each is closed at zero and its item kept,
+    so balances on earlier dates still answer. The items' summaries are
+    recounted and their alerts re-evaluated.
+    """
+    if not lots:
+        return
+    StockMovement.objects.record({pk: -count for pk, _, count in lots})
+    RetiredLot.objects.bulk_create(RetiredLot(stock_id=pk, item_id=item_id) for pk, item_id, _ in lots)
+    item_ids = list({item_id for _, item_id, _ in lots})
+    StockSummary.objects.rebuild(item_ids=item_ids)
+    refresh_alerts_on_commit(item_ids=item_ids)
+
+
+def lot_delta(deltas):
+    """CASE expression mapping each lot primary key to its delta."""
+    return Case(
+        *(When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()),
+        default=Value(0),
+        output_field=models.IntegerField(),
+    )
+
+
+def expire_count(stock):
+    """Drop a cached count so the next access reloads it from the database."""
+    stock.__dict__.pop("count", None)
+
 
 class InventoryStock(models.Model):
     id=models.AutoField(primary_key=True)
@@ -164,8 +424,26 @@ class InventoryStock(models.Model):
     expiration_date = models.DateField(default=django.utils.timezone.now)
     count = models.PositiveIntegerField(default=0)
 
+    objects = InventoryStockQuerySet.as_manager()
+
     class Meta:
         unique_together = ("item", "expiration_date")  # Prevent duplicate stock entries with the same expiration date.
+        indexes = [
+            # Expiry reports only care about lots that still hold stock.
+            models.Index(
+                fields=["expiration_date"],
+                condition=models.Q(count__gt=0),
+                name="stock_expiring_idx",
+            ),
+            # Covers FEFO scans for an item without touching the table.
+            models.Index(
+                fields=["item", "expiration_date", "count"],
+                name="stock_item_expiry_count_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.item} exp. {self.expiration_date}"
 
     def clean(self):
         """Validation before saving."""
@@ -175,58 +453,663 @@ class InventoryStock(models.Model):
     @transaction.atomic
     def save(self, *args, **kwargs):
         self.clean()  # Ensure validations run before saving
+        update_fields = kwargs.get("update_fields")
+        moves_count = "count" in self.__dict__ and (update_fields is None or "count" in update_fields)
+        previous_item_id, previous = self.item_id, 0
+        if not self._state.adding:
+            previous_item_id, previous = (
+                InventoryStock.objects.filter(pk=self.pk)
+                .values_list("item_id", "count")
+                .first()
+            ) or (self.item_id, 0)
+        super().save(*args, **kwargs)
+        # Direct edits can change count, expiry and even the item at once;
+        # recount the items the lot belonged to before and after.
+        item_ids = list({previous_item_id, self.item_id})
+        StockSummary.objects.rebuild(item_ids=item_ids)
+        if moves_count:
+            StockMovement.objects.record({self.pk: self.count - previous})
+        refresh_alerts_on_commit(item_ids=item_ids)
+
+    @transaction.atomic
+    def delete(self, *args, **kwargs):
+        lots = InventoryStock.objects.filter(pk=self.pk).lock_for_delete()
+        result = super().delete(*args, **kwargs)
+        retire_lots(lots)
+        return result
+
+
+class StockSummaryQuerySet(models.QuerySet):
+    def apply_lot_deltas(self, deltas):
+        """
+        Move item totals by ``{stock_id: delta}`` in one UPDATE.
+
+        Each item's share of the deltas is summed by correlated subqueries
+        over just the lots in ``deltas``; lots that had expired by the
+        summary's ``as_of`` date also move the expired figure.
+        """
+        lots = InventoryStock.objects.filter(pk__in=deltas, item=OuterRef("item"))
+        expired_lots = lots.filter(expiration_date__lt=OuterRef("as_of"))
+        self.filter(
+            item__in=InventoryStock.objects.filter(pk__in=deltas).values("item")
+        ).update(
+            total=F("total") + summed(lots, lot_delta(deltas)),
+            expired=F("expired") + summed(expired_lots, lot_delta(deltas)),
+        )
+
+    def recounted(self):
+        """Annotate each summary with totals recomputed from its lots."""
+        lots = InventoryStock.objects.filter(item=OuterRef("item"))
+        expired_lots = lots.filter(expiration_date__lt=OuterRef("as_of"))
+        return self.annotate(
+            lot_total=summed(lots, F("count")),
+            lot_expired=summed(expired_lots, F("count")),
+        )
+
+    def mismatched(self):
+        """Summaries that disagree with the lot rows."""
+        return self.recounted().exclude(total=F("lot_total"), expired=F("lot_expired"))
+
+    @transaction.atomic
+    def rebuild(self, item_ids=None, as_of=None):
+        """
+        Recompute summaries from the lot rows, creating missing ones.
+
+        ``as_of`` (default today) is the date the expired split is taken at.
+        """
+        items = InventoryItem.objects.all()
+        if item_ids is not None:
+            items = items.filter(pk__in=item_ids)
+        missing = items.filter(stock_summary__isnull=True).values_list("pk", flat=True)
+        self.bulk_create(
+            (StockSummary(item_id=pk) for pk in missing.iterator()),
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+        lots = InventoryStock.objects.filter(item=OuterRef("item"))
+        as_of = as_of or datetime.date.today()
+        rebuilt = self.filter(item__in=items).update(
+            total=summed(lots, F("count")),
+            expired=summed(lots.filter(expiration_date__lt=as_of), F("count")),
+            as_of=as_of,
+        )
+        refresh_alerts_on_commit(item_ids=item_ids)
+        return rebuilt
+
+
+def summed(lots, expression):
+    """Correlated ``SUM(expression)`` over ``lots``, zero when empty."""
+    return Coalesce(
+        Subquery(
+            lots.values("item")
+            .annotate(amount=Sum(expression))
+            .values("amount")
+        ),
+        0,
+    )
+
+
+class StockSummary(models.Model):
+    """
+    On-hand totals per item, kept in step with the lot counts.
+
+    ``expired`` counts stock in lots that had expired by ``as_of``; the
+    nightly ``rebuild_stock_summary`` moves ``as_of`` forward.
+    """
+    item = models.OneToOneField(
+        InventoryItem,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stock_summary",
+    )
+    total = models.IntegerField(default=0)
+    expired = models.IntegerField(default=0)
+    as_of = models.DateField(default=datetime.date.today)
+
+    objects = StockSummaryQuerySet.as_manager()
+
+    @property
+    def sellable(self):
+        return self.total - self.expired
+
+def refresh_alerts_on_commit(item_ids=None, stock_ids=None):
+    """
+    Re-evaluate reorder alerts for ``item_ids`` or the items of ``stock_ids``
+    (every item when both are None) after the current transaction commits.
+    """
+    transaction.on_commit(
+        functools.partial(ReorderAlert.objects.refresh, item_ids=item_ids, stock_ids=stock_ids),
+        robust=True,
+    )
+
+
+class ReorderAlertQuerySet(models.QuerySet):
+    def refresh(self, item_ids=None, stock_ids=None, batch_size=1000):
+        """
+        Bring the alert set in line with the summaries for some items.
+
+        Items whose sellable stock is below their reorder point get an alert
+        row (keeping ``since`` if they already had one); every other item in
+        scope loses its row. Returns the number of items now alerting.
+        """
+        summaries = StockSummary.objects.all()
+        alerts = self.all()
+        if item_ids is not None:
+            summaries = summaries.filter(item__in=item_ids)
+            alerts = alerts.filter(item__in=item_ids)
+        if stock_ids is not None:
+            items = InventoryStock.objects.filter(pk__in=stock_ids).values("item")
+            summaries = summaries.filter(item__in=items)
+            alerts = alerts.filter(item__in=items)
+
+        below = summaries.filter(
+            item__reorder_point__isnull=False,
+            item__reorder_point__gt=F("total") - F("expired"),
+        )
+        alerts.exclude(item__in=below.values("item")).delete()
+        rows = (
+            ReorderAlert(
+                item_id=item_id,
+                sellable=sellable,
+                reorder_point=reorder_point,
+                shortfall=reorder_point - sellable,
+            )
+            for item_id, sellable, reorder_point in below.values_list(
+                "item", F("total") - F("expired"), "item__reorder_point"
+            ).iterator()
+        )
+        alerting = 0
+        while batch := list(itertools.islice(rows, batch_size)):
+            self.bulk_create(
+                batch,
+                update_conflicts=True,
+                unique_fields=["item"],
+                update_fields=["sellable", "reorder_point", "shortfall"],
+            )
+            alerting += len(batch)
+        return alerting
+
+
+class ReorderAlert(models.Model):
+    """
+    An item whose sellable stock is below its reorder point.
+
+    Maintained incrementally by ``refresh_alerts_on_commit``, so the
+    reorder dashboard reads only this table, however big the catalogue.
+    """
+    item = models.OneToOneField(
+        InventoryItem,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="reorder_alert",
+    )
+    sellable = models.IntegerField()
+    reorder_point = models.PositiveIntegerField()
+    shortfall = models.IntegerField()
+    since = models.DateTimeField(default=django.utils.timezone.now)
+
+    objects = ReorderAlertQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-shortfall"], name="reorder_alert_shortfall_idx"),
+        ]
+
+
+def day_start(date):
+    """Aware datetime for midnight at the start of ``date``."""
+    return django.utils.timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
+
+
+class StockMovementQuerySet(models.QuerySet):
+    def record(self, deltas):
+        """Append one movement per lot in ``{stock_id: delta}``."""
+        now = django.utils.timezone.now()
+        self.bulk_create(
+            StockMovement(stock_id=pk, delta=delta, created_at=now)
+            for pk, delta in deltas.items()
+            if delta
+        )
+
+    def compact(self, before, batch_size=10_000):
+        """
+        Delete movements from days before ``before``, in bounded chunks.
+
+        Only days already rolled up into snapshots may go; their balances
+        live on in the snapshot rows.
+        """
+        rolled_up = Watermark.objects.date_of(StockSnapshot.WATERMARK)
+        if rolled_up is None or before > rolled_up + datetime.timedelta(days=1):
+            raise ValueError("Roll the ledger up through the day before the cutoff first.")
+        old = self.filter(created_at__lt=day_start(before))
+        deleted = 0
+        while ids := list(old.values_list("pk", flat=True)[:batch_size]):
+            deleted += self.filter(pk__in=ids).delete()[0]
+        return deleted
+
+
+class StockMovement(models.Model):
+    """
+    Append-only record of every change to a lot's count.
+
+    ``InventoryStock.count`` is the running total of a lot's movements;
+    editing or deleting a transaction books a correcting movement at the
+    time of the change rather than rewriting the original one. Rows
+    outlive their lot: deleting a lot books a closing movement instead.
+    """
+    stock = models.ForeignKey(
+        InventoryStock, on_delete=models.DO_NOTHING, db_constraint=False, related_name="movements"
+    )
+    delta = models.IntegerField()
+    created_at = models.DateTimeField(default=django.utils.timezone.now)
+
+    objects = StockMovementQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["stock", "created_at"], name="movement_stock_created_idx"),
+            models.Index(fields=["created_at"], name="movement_created_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Stock movements are append-only")
         super().save(*args, **kwargs)
 
+
+class RetiredLot(models.Model):
+    """Which item a deleted lot belonged to, so its ledger stays reachable."""
+    stock_id = models.IntegerField(primary_key=True)
+    item = models.ForeignKey(
+        InventoryItem, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+"
+    )
+    retired_at = models.DateTimeField(default=django.utils.timezone.now)
+
+
+class StockSnapshotQuerySet(models.QuerySet):
+    @transaction.atomic
+    def roll_up(self, through, batch_size=5000):
+        """
+        Write closing balances for every lot and day with movements, from the
+        day after the last roll-up through ``through``.
+
+        Returns the number of snapshot rows written.
+        """
+        if through >= django.utils.timezone.localdate():
+            raise ValueError("Only finished days can be rolled up.")
+        last = Watermark.objects.date_of(StockSnapshot.WATERMARK)
+        movements = StockMovement.objects.filter(
+            created_at__lt=day_start(through + datetime.timedelta(days=1))
+        )
+        if last is not None:
+            if through <= last:
+                return 0
+            movements = movements.filter(
+                created_at__gte=day_start(last + datetime.timedelta(days=1))
+            )
+
+        # Read from the snapshots themselves; a deleted lot keeps its ledger.
+        opening = dict(
+            self.filter(
+                stock__in=movements.values("stock"),
+                date=Subquery(self.filter(stock=OuterRef("stock")).order_by("-date").values("date")[:1]),
+            ).values_list("stock", "balance")
+        )
+        daily = (
+            movements.annotate(day=TruncDate("created_at"))
+            .values("stock", "day")
+            .annotate(moved=Sum("delta"))
+            .order_by("stock", "day")
+            .values_list("stock", "day", "moved")
+        )
+
+        def closing_balances():
+            running = {}
+            for stock_id, day, moved in daily.iterator(chunk_size=batch_size):
+                balance = running.get(stock_id, opening.get(stock_id) or 0) + moved
+                running[stock_id] = balance
+                yield StockSnapshot(stock_id=stock_id, date=day, balance=balance)
+
+        written = 0
+        snapshots = closing_balances()
+        while batch := list(itertools.islice(snapshots, batch_size)):
+            self.bulk_create(batch)
+            written += len(batch)
+        Watermark.objects.advance(StockSnapshot.WATERMARK, through)
+        return written
+
+    def _balances_as_of(self, date, lots):
+        """
+        Closing balance on ``date`` of the lots matched by the ``lots``
+        condition on the ``stock`` column, as ``{stock_id: balance}``;
+        lots with no ledger rows by then are left out.
+
+        Days up to the roll-up watermark are answered from snapshots alone:
+        a lot's latest snapshot at or before the day is its balance, since
+        every day it moved on has one. Movements are only summed for the
+        days after the watermark, which the nightly roll-up keeps to one.
+        Only ledger tables are read, so deleted lots still answer.
+        """
+        rolled_up = Watermark.objects.date_of(StockSnapshot.WATERMARK)
+        balances = defaultdict(int)
+        if rolled_up is not None:
+            latest = (
+                self.filter(stock=OuterRef("stock"), date__lte=min(date, rolled_up))
+                .order_by("-date")
+                .values("date")[:1]
+            )
+            balances.update(self.filter(lots, date=Subquery(latest)).values_list("stock", "balance"))
+        if rolled_up is None or date > rolled_up:
+            movements = StockMovement.objects.filter(
+                lots, created_at__lt=day_start(date + datetime.timedelta(days=1))
+            )
+            if rolled_up is not None:
+                movements = movements.filter(
+                    created_at__gte=day_start(rolled_up + datetime.timedelta(days=1))
+                )
+            for stock_id, moved in (
+                movements.order_by().values("stock").annotate(moved=Sum("delta")).values_list("stock", "moved")
+            ):
+                balances[stock_id] += moved
+        return dict(balances)
+
+    def balances_as_of(self, date, stock_ids):
+        """Closing balances on ``date`` for ``stock_ids`` (ids or a ``values("pk")`` queryset)."""
+        return self._balances_as_of(date, Q(stock__in=stock_ids))
+
+    def item_balances_as_of(self, item, date):
+        """Closing balances on ``date`` of every lot ``item`` has had, deleted ones included."""
+        return self._balances_as_of(
+            date,
+            Q(stock__in=InventoryStock.objects.filter(item=item).values("pk"))
+            | Q(stock__in=RetiredLot.objects.filter(item=item).values("stock_id")),
+        )
+
+    def balance_as_of(self, stock_id, date):
+        """A lot's closing balance on ``date``; see ``_balances_as_of``."""
+        return self.balances_as_of(date, [stock_id]).get(stock_id, 0)
+
+
+class StockSnapshot(models.Model):
+    """A lot's closing balance at the end of ``date``."""
+    WATERMARK = "ledger_rollup"
+
+    stock = models.ForeignKey(
+        InventoryStock, on_delete=models.DO_NOTHING, db_constraint=False, related_name="snapshots"
+    )
+    date = models.DateField()
+    balance = models.IntegerField()
+
+    objects = StockSnapshotQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ("stock", "date")
+
+
+class WatermarkQuerySet(models.QuerySet):
+    def date_of(self, name):
+        return self.filter(name=name).values_list("date", flat=True).first()
+
+    def advance(self, name, date):
+        self.update_or_create(name=name, defaults={"date": date})
+
+
+class Watermark(models.Model):
+    """How far an incremental job has got, keyed by job name."""
+    name = models.CharField(max_length=64, primary_key=True)
+    date = models.DateField()
+
+    objects = WatermarkQuerySet.as_manager()
+
+
+class CounterQuerySet(models.QuerySet):
+    def value_of(self, name):
+        return self.filter(name=name).values_list("value", flat=True).first() or 0
+
+    def bump(self, name):
+        """Add one in the database, so concurrent bumps from any process all count."""
+        if not self.filter(name=name).update(value=F("value") + 1):
+            _, created = self.get_or_create(name=name, defaults={"value": 1})
+            if not created:
+                self.filter(name=name).update(value=F("value") + 1)
+
+
+class Counter(models.Model):
+    """A named number every process shares, such as a cache version."""
+    name = models.CharField(max_length=64, primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    objects = CounterQuerySet.as_manager()
+
+
+class InventoryTransactionManager(models.Manager):
+    @transaction.atomic
+    def bulk_post(self, transactions, batch_size=None):
+        """
+        Post many transactions at once.
+
+        Deltas are summed per lot and applied with batched UPDATEs, then the
+        rows are written with ``bulk_create``. Stock is checked against the
+        net effect of the whole batch; any shortfall rolls everything back.
+        """
+        transactions = list(transactions)
+        deltas = defaultdict(int)
+        for posting in transactions:
+            deltas[posting.item_stock_id] += self.model.signed_quantity(
+                posting.transaction_type, posting.quantity
+            )
+        InventoryStock.objects.apply_deltas(deltas)
+        created = self.bulk_create(transactions, batch_size=batch_size)
+        for posting in created:
+            posting._posted = tuple(getattr(posting, name) for name in self.model.POSTING_FIELDS)
+            if self.model.item_stock.is_cached(posting):
+                expire_count(posting.item_stock)
+        return created
+
+
 class InventoryTransaction(models.Model):
     ADD = "add"
     REMOVE = "remove"
+    # Stock destroyed rather than dispensed, e.g. by the expiry sweep; kept
+    # apart from REMOVE so it never counts as consumption.
+    WRITE_OFF = "write_off"
     item_stock = models.ForeignKey(InventoryStock, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     quantity = models.IntegerField()
     transaction_type = models.CharField(
-            max_length=10, choices=[(ADD, "Add"), (REMOVE, "Remove")]
+            max_length=10, choices=[(ADD, "Add"), (REMOVE, "Remove"), (WRITE_OFF, "Write-off")]
         )  # Explicitly track addition or removal
+    created_at = models.DateTimeField(default=django.utils.timezone.now)
+
+    objects = InventoryTransactionManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "created_at"], name="transaction_user_created_idx"),
+            # Window scans for consumption reports.
+            models.Index(fields=["created_at"], name="transaction_created_idx"),
+        ]
+
+    POSTING_FIELDS = ("item_stock_id", "transaction_type", "quantity")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(name in loaded for name in cls.POSTING_FIELDS):
+            instance._posted = tuple(loaded[name] for name in cls.POSTING_FIELDS)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or set(self.POSTING_FIELDS) <= set(fields):
+            self._posted = tuple(getattr(self, name) for name in self.POSTING_FIELDS)
+        else:
+            self.__dict__.pop("_posted", None)
+
+    @classmethod
+    def signed_quantity(cls, transaction_type, quantity):
+        """Stock delta a transaction of this type and quantity applies."""
+        match transaction_type:
+            case cls.ADD:
+                return quantity
+            case cls.REMOVE | cls.WRITE_OFF:
+                return -quantity
+            case _:
+                raise ValueError(f"Invalid transaction type: {transaction_type}")
+
+    def _locked_posting(self):
+        """
+        ``(item_stock_id, transaction_type, quantity)`` as stored, read under
+        ``select_for_update``; None for a row that does not exist.
+        """
+        if self._state.adding:
+            return None
+        return (
+            InventoryTransaction.objects.select_for_update()
+            .filter(pk=self.pk)
+            .values_list(*self.POSTING_FIELDS)
+            .first()
+        )
+
+    def _apply_deltas(self, deltas):
+        InventoryStock.objects.apply_deltas(deltas)
+        if InventoryTransaction.item_stock.is_cached(self):
+            expire_count(self.item_stock)
+
+    def _post(self, posted, save):
+        """
+        Move stock from the ``posted`` state to this instance's, then write
+        the row with ``save``.
+        """
+        deltas = {self.item_stock_id: self.signed_quantity(self.transaction_type, self.quantity)}
+        if posted is not None:
+            # Reverse the previous effect in the same UPDATE as the new one.
+            old_stock_id, old_type, old_quantity = posted
+            deltas[old_stock_id] = deltas.get(old_stock_id, 0) - self.signed_quantity(old_type, old_quantity)
+        self._apply_deltas(deltas)
+        save()
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        guard = self.__dict__.get("_update_guard")
+        if guard is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        base_qs = base_qs.filter(**dict(zip(self.POSTING_FIELDS, guard)))
+        if not super()._do_update(base_qs, using, pk_val, values, update_fields, True):
+            raise StalePosting()
+        return True
 
     @transaction.atomic
     def save(self, *args, **kwargs):
-        if self.pk:
-            # Get the existing transaction before updating
-            old_transaction = InventoryTransaction.objects.get(pk=self.pk)
-
-            # Reverse previous transaction effect
-            match old_transaction.transaction_type:
-                case self.ADD:
-                    self.item_stock.count -= old_transaction.quantity
-                case self.REMOVE:
-                    self.item_stock.count += old_transaction.quantity
-                case _:
-                    raise ValueError(f"Invalid transaction type: {self.transaction_type}")
-
-        # Apply new transaction effect
-        match self.transaction_type:
-            case self.ADD:
-                self.item_stock.count += self.quantity
-            case self.REMOVE:
-                if self.item_stock.count < self.quantity:
-                    raise ValueError("Not enough stock available")
-                self.item_stock.count -= self.quantity
-            case _:
-                raise ValueError(f"Invalid transaction type: {self.transaction_type}")
+        posted = None if self._state.adding else self.__dict__.get("_posted")
+        saved = False
+        if posted is not None:
+            # Trust the state remembered at load time, but only write the row
+            # if it still holds it; otherwise another save got there first
+            # (or a rollback undid ours), and the reversal is redone from the
+            # row as stored.
+            self._update_guard = posted
+            try:
+                with transaction.atomic():
+                    self._post(posted, lambda: super(InventoryTransaction, self).save(*args, **kwargs))
+                saved = True
+            except StalePosting:
+                pass
+            finally:
+                del self._update_guard
+        if not saved:
+            self._post(self._locked_posting(), lambda: super(InventoryTransaction, self).save(*args, **kwargs))
+        self._posted = tuple(getattr(self, name) for name in self.POSTING_FIELDS)
 
-        self.item_stock.save()
-        super().save(*args, **kwargs)
-    
     @transaction.atomic
     def delete(self, *args, **kwargs):
         """Revert stock changes when transaction is deleted."""
-        match self.transaction_type:
-            case self.ADD:
-                self.item_stock.count -= self.quantity  # Remove added stock
-            case self.REMOVE:
-                self.item_stock.count += self.quantity  # Restore removed stock
-            case _:
-                raise ValueError(f"Invalid transaction type: {self.transaction_type}")
+        posted = self._locked_posting()
+        if posted is not None:
+            stock_id, transaction_type, quantity = posted
+            self._apply_deltas({stock_id: -self.signed_quantity(transaction_type, quantity)})
+        result = super().delete(*args, **kwargs)
+        self.__dict__.pop("_posted", None)
+        return result
+
+
+class ArchivedTransactionQuerySet(models.QuerySet):
+    def archive(self, before, batch_size=5000):
+        """
+        Move transactions created before ``before`` into the archive, oldest
+        first, one bounded chunk per database transaction.
 
+        Rows are copied and then deleted in bulk, never through
+        ``InventoryTransaction.delete``, so lot counts, summaries and the
+        stock ledger are untouched: archiving changes where history lives,
+        not what is on hand. Returns the number of rows moved.
+        """
+        old = InventoryTransaction.objects.filter(created_at__lt=before).order_by("created_at", "pk")
+        moved = 0
+        while True:
+            with transaction.atomic():
+                rows = list(
+                    old.values(
+                        "id", "item_stock_id", "item_stock__item_id", "user_id",
+                        "quantity", "transaction_type", "created_at",
+                    )[:batch_size]
+                )
+                if not rows:
+                    break
+                self.bulk_create(
+                    ArchivedTransaction(
+                        id=row["id"],
+                        item_stock_id=row["item_stock_id"],
+                        item_id=row["item_stock__item_id"],
+                        user_id=row["user_id"],
+                        quantity=row["quantity"],
+                        transaction_type=row["transaction_type"],
+                        created_at=row["created_at"],
+                    )
+                    for row in rows
+                )
+                InventoryTransaction.objects.filter(pk__in=[row["id"] for row in rows]).delete()
+            moved += len(rows)
+        return moved
 
-        self.item_stock.save()  # Update stock in database
-        super().delete(*args, **kwargs)
\ No newline at end of file
+
+class ArchivedTransaction(models.Model):
+    """
+    An ``InventoryTransaction`` past the archive horizon, kept read-only.
+
+    Ids are the original ones. The foreign keys carry no database
+    constraint so history outlives the lots, items and users it names;
+    ``item`` is copied from the lot for per-item audits.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # Only the (item, created_at) index below; the archive is read by item
+    # and date, so per-column foreign key indexes would just slow the moves.
+    item_stock = models.ForeignKey(
+        InventoryStock, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+"
+    )
+    item = models.ForeignKey(
+        InventoryItem, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+"
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name="+"
+    )
+    quantity = models.IntegerField()
+    transaction_type = models.CharField(
+        max_length=10, choices=InventoryTransaction._meta.get_field("transaction_type").choices
+    )
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=django.utils.timezone.now)
+
+    objects = ArchivedTransactionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["item", "created_at"], name="archived_item_created_idx"),
+            models.Index(fields=["created_at"], name="archived_created_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Archived transactions are read-only")
+        super().save(*args, **kwargs)
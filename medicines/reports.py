@@ -0,0 +1,96 @@
+"""
+Daily inventory reports. All grouping happens in SQL; Python only merges
+the per-item figures that come back.
+"""
+import datetime
+import uuid
+from collections import namedtuple
+from dataclasses import dataclass
+
+from django.db.models import Sum
+from django.utils import timezone
+from django.db.models.functions import TruncWeek
+
+from medicines.models import Category, InventoryStock, InventoryTransaction, StockSnapshot, StockSummary
+
+ExpiryRow = namedtuple("ExpiryRow", "category week quantity")
+
+
+def expiry_by_category_week(weeks=12, today=None):
+    """
+    Quantity expiring per category per week over the next ``weeks`` weeks.
+
+    Rows are ``(category, week, quantity)`` named tuples where ``week`` is
+    the Monday the bucket starts on, ordered by week then category. The
+    database groups on the integer category id; names come from the cached
+    reference table.
+    """
+    today = today or datetime.date.today()
+    rows = (
+        InventoryStock.objects.filter(
+            count__gt=0,
+            expiration_date__gte=today,
+            expiration_date__lt=today + datetime.timedelta(weeks=weeks),
+        )
+        .annotate(week=TruncWeek("expiration_date"))
+        .values("item__category", "week")
+        .annotate(quantity=Sum("count"))
+        .order_by()
+        .values_list("item__category", "week", "quantity")
+    )
+    report = [
+        ExpiryRow(Category.objects.by_id(category_id).label, week, quantity)
+        for category_id, week, quantity in rows
+    ]
+    report.sort(key=lambda row: (row.week, row.category))
+    return report
+
+
+@dataclass
+class Cover:
+    item_id: uuid.UUID
+    item_name: str
+    sellable: int
+    consumed: int
+    daily_rate: float
+    days_of_cover: float | None  # None when nothing was dispensed
+
+
+def days_of_cover(window_days=30, today=None):
+    """
+    Consumption rate and days of cover for every item, lowest cover first.
+
+    The rate is REMOVE quantity over the last ``window_days`` days; stock on
+    hand is the sellable figure from the item summaries.
+    """
+    today = today or datetime.date.today()
+    since = timezone.make_aware(
+        datetime.datetime.combine(today - datetime.timedelta(days=window_days), datetime.time.min)
+    )
+    consumed = dict(
+        InventoryTransaction.objects.filter(
+            created_at__gte=since, transaction_type=InventoryTransaction.REMOVE
+        )
+        .values("item_stock__item")
+        .annotate(consumed=Sum("quantity"))
+        .values_list("item_stock__item", "consumed")
+    )
+    summaries = StockSummary.objects.values_list("item_id", "item__item_name", "total", "expired")
+
+    report = []
+    for item_id, item_name, total, expired in summaries.iterator(chunk_size=2000):
+        sellable = total - expired
+        used = consumed.get(item_id, 0)
+        rate = used / window_days
+        report.append(Cover(item_id, item_name, sellable, used, rate, sellable / rate if rate else None))
+    report.sort(key=lambda row: (row.days_of_cover is None, row.days_of_cover or 0))
+    return report
+
+
+def stock_as_of(item, date):
+    """
+    Quantity of ``item`` on hand at the close of ``date``, expired lots
+    included, from its lots' ledger balances rather than a replay of every
+    transaction.
+    """
+    return sum(StockSnapshot.objects.item_balances_as_of(item, date).values())
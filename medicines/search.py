@@ -0,0 +1,148 @@
+"""
+Ranked item search over item, brand and generic names.
+
+SQLite uses the ``medicines_inventoryitem_fts`` FTS5 table, which triggers
+keep in step with the catalogue. PostgreSQL uses trigram GIN indexes.
+Both come from migration 0015. Any other backend falls back to unindexed
+``icontains``.
+"""
+import functools
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+from medicines.models import InventoryItem
+
+FTS_TABLE = "medicines_inventoryitem_fts"
+SEARCH_FIELDS = ("item_name", "brand_name", "generic_name")
+# Column weights for ranking: an item name hit outranks brand, then generic.
+FTS_WEIGHTS = (3.0, 2.0, 1.0)
+MAX_CANDIDATES = 1000
+
+TOKEN = re.compile(r"\w+")
+
+
+@functools.cache
+def has_fts_table(alias, name):
+    with connections[alias].cursor() as cursor:
+        return FTS_TABLE in connections[alias].introspection.table_names(cursor)
+
+
+def fts_query(q):
+    """Every word of ``q`` must prefix-match some indexed word."""
+    return " ".join(f'"{token}"*' for token in TOKEN.findall(q))
+
+
+def search(q, limit=20, using="default"):
+    """Items matching ``q``, best match first."""
+    if not TOKEN.search(q):
+        return []
+    connection = connections[using]
+    if connection.vendor == "sqlite" and has_fts_table(using, connection.settings_dict["NAME"]):
+        # Rank at most MAX_CANDIDATES matches and cut to ``limit`` inside the
+        # FTS table, so only the final rows are joined back to the catalogue.
+        # A very broad prefix ("a") is ranked among its first candidates
+        # only; the next keystroke narrows it.
+        return list(InventoryItem.objects.using(using).raw(
+            f"""
+            SELECT item.*, hits.rank
+            FROM (
+                SELECT rowid, rank FROM (
+                    SELECT rowid, rank FROM {FTS_TABLE}
+                    WHERE {FTS_TABLE} MATCH %s
+                    LIMIT %s
+                )
+                ORDER BY rank
+                LIMIT %s
+            ) AS hits
+            JOIN medicines_inventoryitem AS item ON item.rowid = hits.rowid
+            ORDER BY hits.rank
+            """,
+            [fts_query(q), MAX_CANDIDATES, limit],
+        ))
+
+    # Every word must appear in one of the names, as with the FTS query.
+    items = InventoryItem.objects.using(using)
+    for token in TOKEN.findall(q):
+        matches = Q()
+        for field in SEARCH_FIELDS:
+            matches |= Q(**{f"{field}__icontains": token})
+        items = items.filter(matches)
+    if connection.vendor == "postgresql":
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        rank = sum(
+            weight * TrigramSimilarity(field, q)
+            for field, weight in zip(SEARCH_FIELDS, FTS_WEIGHTS)
+        )
+        items = items.annotate(rank=rank).order_by("-rank")
+    else:
+        items = items.order_by("item_name")
+    return list(items[:limit])
+
+
+def create_search_index(schema_editor):
+    """Create the backend's search structures; called from migrations."""
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        columns = ", ".join(SEARCH_FIELDS)
+        new_values = ", ".join(f"new.{field}" for field in SEARCH_FIELDS)
+        old_values = ", ".join(f"old.{field}" for field in SEARCH_FIELDS)
+        # External content table: the FTS index points at catalogue rowids
+        # rather than storing a second copy of the names.
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({columns}, "
+            "content='medicines_inventoryitem', "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON medicines_inventoryitem BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.rowid, {new_values}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON medicines_inventoryitem BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values}); END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON medicines_inventoryitem BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.rowid, {old_values}); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.rowid, {new_values}); END"
+        )
+        # The hidden rank column orders by bm25 with the column weights.
+        weights = ", ".join(str(weight) for weight in FTS_WEIGHTS)
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25({weights})')"
+        )
+        rebuild_search_index(schema_editor)
+    elif connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for field in SEARCH_FIELDS:
+            # Matches the UPPER(col::text) LIKE UPPER(...) that icontains emits.
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS medicines_{field}_trgm "
+                f"ON medicines_inventoryitem USING gin (UPPER({field}::text) gin_trgm_ops)"
+            )
+    has_fts_table.cache_clear()
+
+
+def drop_search_index(schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == "sqlite":
+        for suffix in ("ai", "ad", "au"):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif connection.vendor == "postgresql":
+        for field in SEARCH_FIELDS:
+            schema_editor.execute(f"DROP INDEX IF EXISTS medicines_{field}_trgm")
+    has_fts_table.cache_clear()
+
+
+def rebuild_search_index(schema_editor):
+    """
+    Re-read every catalogue row into the SQLite index.
+
+    Needed after anything that renumbers catalogue rowids, such as VACUUM.
+    """
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
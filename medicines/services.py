@@ -0,0 +1,120 @@
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from medicines.models import InsufficientStock, InventoryStock, InventoryTransaction, Watermark
+
+EXPIRY_SWEEP = "expiry_sweep"
+
+
+@transaction.atomic
+def dispense(item, quantity, user):
+    """
+    Dispense ``quantity`` of ``item`` first-expiry-first-out.
+
+    Sellable lots are locked in expiration order and consumed until the
+    quantity is covered; one REMOVE transaction is written per touched lot.
+    The whole dispense is one SELECT ... FOR UPDATE, one UPDATE and one
+    INSERT, plus the summary and ledger writes. Returns the created
+    transactions.
+    """
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive")
+
+    lots = (
+        InventoryStock.objects.select_for_update()
+        .filter(item=item, count__gt=0, expiration_date__gte=datetime.date.today())
+        .order_by("expiration_date")
+        .values_list("pk", "count")
+    )
+    postings = []
+    remaining = quantity
+    # Reading lazily means the lots past the one that completes the
+    # dispense are never fetched (nor locked, on PostgreSQL).
+    for stock_id, count in lots.iterator(chunk_size=32):
+        taken = min(count, remaining)
+        postings.append(
+            InventoryTransaction(
+                item_stock_id=stock_id,
+                user=user,
+                quantity=taken,
+                transaction_type=InventoryTransaction.REMOVE,
+            )
+        )
+        remaining -= taken
+        if not remaining:
+            break
+    if remaining:
+        raise InsufficientStock()
+
+    return InventoryTransaction.objects.bulk_post(postings)
+
+
+@transaction.atomic
+def receive(item, quantity, expiration_date, user):
+    """
+    Receive ``quantity`` of ``item`` into the lot expiring on
+    ``expiration_date``, opening the lot if this is its first delivery.
+    Returns the ADD transaction.
+    """
+    if quantity <= 0:
+        raise ValueError("Quantity must be positive")
+    # As in InventoryStock.clean, which only runs when the lot is new.
+    if expiration_date < datetime.date.today():
+        raise ValidationError("Cannot add stock with an expiration date in the past.")
+
+    stock, _ = InventoryStock.objects.get_or_create(item=item, expiration_date=expiration_date)
+    return InventoryTransaction.objects.create(
+        item_stock=stock,
+        user=user,
+        quantity=quantity,
+        transaction_type=InventoryTransaction.ADD,
+    )
+
+
+def unswept_lots(today=None, full=False):
+    """
+    Lots still holding stock that expired before ``today`` and since the
+    last sweep, or at any time with ``full``. Read through the partial
+    expiry index, so only recently expired lots are visited.
+    """
+    today = today or datetime.date.today()
+    lots = InventoryStock.objects.filter(count__gt=0, expiration_date__lt=today)
+    swept = None if full else Watermark.objects.date_of(EXPIRY_SWEEP)
+    if swept is not None:
+        lots = lots.filter(expiration_date__gte=swept)
+    return lots
+
+
+def write_off_expired(user, today=None, batch_size=500, full=False):
+    """
+    Write off the stock left in lots that expired since the last sweep,
+    as WRITE_OFF transactions by ``user``.
+
+    Each batch is re-read under lock and posted in its own transaction,
+    so a run that dies part way leaves whole batches behind; the next run
+    starts again from the same high-water mark and finds only the lots
+    still holding stock. Returns ``(lots, quantity)`` written off.
+    """
+    today = today or datetime.date.today()
+    lots = unswept_lots(today, full).select_for_update().order_by("expiration_date", "pk")
+    swept = quantity = 0
+    while True:
+        with transaction.atomic():
+            batch = list(lots.values_list("pk", "count")[:batch_size])
+            if not batch:
+                break
+            InventoryTransaction.objects.bulk_post(
+                InventoryTransaction(
+                    item_stock_id=stock_id,
+                    user=user,
+                    quantity=count,
+                    transaction_type=InventoryTransaction.WRITE_OFF,
+                )
+                for stock_id, count in batch
+            )
+        swept += len(batch)
+        quantity += sum(count for _, count in batch)
+    Watermark.objects.advance(EXPIRY_SWEEP, today)
+    return swept, quantity
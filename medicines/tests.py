@@ -1,23 +1,40 @@
+import csv
 import datetime
+import json
+import os
+import tempfile
+import unittest
 import uuid
+from io import StringIO
+from unittest import mock
+from django.contrib import admin
+from django.contrib.admin.models import DELETION, LogEntry
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
 from django.core.exceptions import ValidationError
-from medicines.models import CategoryType, InventoryItem, InventoryStock, InventoryTransaction, PackagingType, SubcategoryType, UnitType
-from users.models import CustomUser
+from django.db import connection, transaction as db_transaction
+from django.test.utils import CaptureQueriesContext
+from medicines.models import ArchivedTransaction, Category, CategoryType, Counter, InsufficientStock, InventoryItem, InventoryStock, InventoryTransaction, Packaging, PackagingType, ReorderAlert, StockMovement, StockSnapshot, StockSummary, Subcategory, SubcategoryType, Unit, UnitType, Watermark, validate_item_choices
+from medicines import catalogue, reports, search
+from medicines.admin import EstimatedCountPaginator, estimated_row_count
+from medicines.services import EXPIRY_SWEEP, dispense, write_off_expired
+from users.models import SYSTEM_USER_EMAIL, CustomUser
 
 def create_test_item(self):
     self.item = InventoryItem.objects.create(
         id=str(uuid.uuid4()),  # Ensure a valid UUID
-        category=CategoryType.ANTACIDS,
-        subcategory=SubcategoryType.ANTACID,
+        category=Category.objects.get_for(CategoryType.ANTACIDS),
+        subcategory=Subcategory.objects.get_for(SubcategoryType.ANTACID),
         item_name="Magnesium Hydroxide",
         brand_name="Phillips' Milk of Magnesia",
         generic_name="Magnesium Hydroxide",
         dosage_form="Liquid",
         strength_per_size="400mg/5ml",
-        packaging=PackagingType.BOTTLE,
+        packaging=Packaging.objects.get_for(PackagingType.BOTTLE),
         quantity=120,
-        unit_size=UnitType.ML,
+        unit_size=Unit.objects.get_for(UnitType.ML),
     )
 
 def create_test_stock(self):
@@ -39,68 +56,114 @@ class ItemTestCase(TestCase):
         item = InventoryItem.objects.get(item_name="Magnesium Hydroxide")
         self.assertIsNotNone(item)
 
+    def test_item_id_is_a_uuid(self):
+        """Ids come back as UUIDs and match in either text form"""
+        item = InventoryItem.objects.get(pk=str(self.item.pk).replace("-", ""))
+        self.assertIsInstance(item.pk, uuid.UUID)
+        self.assertEqual(str(item.pk), self.item.pk)
+        self.assertEqual(InventoryStock.objects.get(pk=self.stocks.pk).item_id, item.pk)
+
+    def test_gtin_is_normalised_and_checked(self):
+        """Barcodes are stored as GTIN-14 and must carry a valid check digit"""
+        self.item.gtin = "4006381333931"
+        self.item.save()
+        self.assertEqual(InventoryItem.objects.get(pk=self.item.pk).gtin, "04006381333931")
+        self.item.gtin = "4006381333932"
+        with self.assertRaises(ValidationError):
+            self.item.save()
+        self.item.gtin = ""
+        self.item.save()
+        self.assertIsNone(InventoryItem.objects.get(pk=self.item.pk).gtin)
+
     def test_default_stock_value(self):
         """Ensure stocks are initialized correctly"""
         self.assertEqual(self.stocks.count, 5)
     
     def test_invalid_unit_type_raise_error(self):
-        with self.assertRaises(ValidationError):
+        with self.assertRaises(ValidationError) as raised:
             InventoryItem.objects.create(
-                category=CategoryType.ANTACIDS,
-                subcategory=SubcategoryType.ANTACID,
+                category=Category.objects.get_for(CategoryType.ANTACIDS),
+                subcategory=Subcategory.objects.get_for(SubcategoryType.ANTACID),
                 item_name="Magnesium Hydroxide",
                 brand_name="Phillips' Milk of Magnesia",
                 generic_name="Magnesium Hydroxide",
                 dosage_form="Liquid",
                 strength_per_size="400mg/5ml",
-                packaging=PackagingType.BOTTLE,
+                packaging=Packaging.objects.get_for(PackagingType.BOTTLE),
                 quantity=120,
-                unit_size="lkjsdf",
+                unit_size_id=9999,
             )
+        self.assertEqual(list(raised.exception.message_dict), ["unit_size"])
 
     def test_invalid_category_type_raise_error(self):
-        with self.assertRaises(ValidationError):
+        with self.assertRaises(ValidationError) as raised:
             InventoryItem.objects.create(
-                category="SOME INVALID CATEOGRY",
-                subcategory=SubcategoryType.ANTACID,
+                category_id=9999,
+                subcategory=Subcategory.objects.get_for(SubcategoryType.ANTACID),
                 item_name="Magnesium Hydroxide",
                 brand_name="Phillips' Milk of Magnesia",
                 generic_name="Magnesium Hydroxide",
                 dosage_form="Liquid",
                 strength_per_size="400mg/5ml",
-                packaging=PackagingType.BOTTLE,
+                packaging=Packaging.objects.get_for(PackagingType.BOTTLE),
                 quantity=120,
-                unit_size=UnitType.EACH,  
+                unit_size=Unit.objects.get_for(UnitType.EACH),  
             )
+        self.assertEqual(list(raised.exception.message_dict), ["category"])
     def test_invalid_subcategory_type_raise_error(self):
-        with self.assertRaises(ValidationError):
+        with self.assertRaises(ValidationError) as raised:
             InventoryItem.objects.create(
-                category=CategoryType.ANTACIDS,
-                subcategory="SOME INVALID SUBCATEGORY",
+                category=Category.objects.get_for(CategoryType.ANTACIDS),
+                subcategory_id=9999,
                 item_name="Magnesium Hydroxide",
                 brand_name="Phillips' Milk of Magnesia",
                 generic_name="Magnesium Hydroxide",
                 dosage_form="Liquid",
                 strength_per_size="400mg/5ml",
-                packaging="Bottle",
+                packaging=Packaging.objects.get_for(PackagingType.BOTTLE),
                 quantity=120,
-                unit_size=UnitType.EACH,  
+                unit_size=Unit.objects.get_for(UnitType.EACH),  
             )
+        self.assertEqual(list(raised.exception.message_dict), ["subcategory"])
 
     def test_invalid_packaging_type_raise_error(self):
-        with self.assertRaises(ValidationError):
+        with self.assertRaises(ValidationError) as raised:
             InventoryItem.objects.create(
-                category="SOME INVALID CATEOGRY",
-                subcategory=SubcategoryType.ANTACID,
+                category=Category.objects.get_for(CategoryType.ANTACIDS),
+                subcategory=Subcategory.objects.get_for(SubcategoryType.ANTACID),
                 item_name="Magnesium Hydroxide",
                 brand_name="Phillips' Milk of Magnesia",
                 generic_name="Magnesium Hydroxide",
                 dosage_form="Liquid",
                 strength_per_size="400mg/5ml",
-                packaging="INVALID LPACKAGING TYPE",
+                packaging_id=9999,
                 quantity=120,
-                unit_size=UnitType.EACH,  
+                unit_size=Unit.objects.get_for(UnitType.EACH),  
             )
+        self.assertEqual(list(raised.exception.message_dict), ["packaging"])
+
+class ChoiceValidationTestCase(TestCase):
+    def test_reference_rows_are_cached(self):
+        Unit.objects.get_for(UnitType.ML)
+        with self.assertNumQueries(0):
+            self.assertEqual(Unit.objects.get_for(UnitType.ML).label, "Milliliters")
+            self.assertEqual(Category.objects.by_id(Category.objects.get_for(CategoryType.ANTACIDS).pk).value, CategoryType.ANTACIDS)
+
+    def test_lookup_accepts_labels_in_any_case(self):
+        self.assertEqual(Packaging.objects.lookup("100's per pack").value, PackagingType.HUNDRED_PER_PACK)
+        self.assertEqual(Unit.objects.lookup("grams").value, UnitType.G)
+
+    def test_new_rows_need_no_deploy(self):
+        with self.assertRaises(ValidationError):
+            Subcategory.objects.get_for("Antiseptics")
+        Subcategory.objects.create(value="Antiseptics", label="Antiseptics")
+        self.assertEqual(Subcategory.objects.get_for("Antiseptics").label, "Antiseptics")
+
+    def test_validate_item_choices(self):
+        validate_item_choices({"unit_size": Unit.objects.get_for(UnitType.ML).pk, "packaging": Packaging.objects.get_for(PackagingType.JAR).pk})
+        with self.assertRaises(ValidationError):
+            validate_item_choices({"unit_size": Unit.objects.get_for(UnitType.ML).pk, "packaging": 9999})
+
 
 class TransactionTestCase(TestCase):
     def setUp(self):
@@ -237,6 +300,1142 @@ class TransactionTestCase(TestCase):
             transaction.save()
     
 
+class StockMovementTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        create_test_stock(self)
+        self.user = CustomUser.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def test_dispense_is_lot_and_summary_update_plus_insert(self):
+        """A removal costs the lot and summary UPDATEs, the ledger INSERT and the INSERT"""
+        with CaptureQueriesContext(connection) as ctx:
+            InventoryTransaction.objects.create(
+                item_stock=self.stocks,
+                user=self.user,
+                quantity=3,
+                transaction_type=InventoryTransaction.REMOVE,
+            )
+        statements = [q["sql"].split()[0] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(statements, ["UPDATE", "UPDATE", "INSERT", "INSERT"])
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 2)
+
+    def test_stale_instance_does_not_lose_updates(self):
+        """Two counters holding the same stale lot both get their removal applied"""
+        other_counter = InventoryStock.objects.get(id=self.stocks.id)
+        InventoryTransaction.objects.create(
+            item_stock=self.stocks,
+            user=self.user,
+            quantity=2,
+            transaction_type=InventoryTransaction.REMOVE,
+        )
+        InventoryTransaction.objects.create(
+            item_stock=other_counter,
+            user=self.user,
+            quantity=2,
+            transaction_type=InventoryTransaction.REMOVE,
+        )
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 1)
+
+    def test_insufficient_stock_leaves_count_untouched(self):
+        with self.assertRaises(InsufficientStock):
+            InventoryTransaction.objects.create(
+                item_stock=self.stocks,
+                user=self.user,
+                quantity=6,
+                transaction_type=InventoryTransaction.REMOVE,
+            )
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 5)
+        self.assertEqual(InventoryTransaction.objects.count(), 0)
+
+    def test_cached_count_is_refreshed_after_movement(self):
+        InventoryTransaction.objects.create(
+            item_stock=self.stocks,
+            user=self.user,
+            quantity=4,
+            transaction_type=InventoryTransaction.ADD,
+        )
+        self.assertEqual(self.stocks.count, 9)
+
+    def test_edit_of_loaded_transaction_skips_refetch(self):
+        created = InventoryTransaction.objects.create(
+            item_stock=self.stocks,
+            user=self.user,
+            quantity=2,
+            transaction_type=InventoryTransaction.ADD,
+        )
+        loaded = InventoryTransaction.objects.get(pk=created.pk)
+        loaded.quantity = 4
+        with CaptureQueriesContext(connection) as ctx:
+            loaded.save()
+        statements = [q["sql"].split()[0] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(statements, ["UPDATE", "UPDATE", "INSERT", "UPDATE"])
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 9)
+
+    def test_stale_loaded_transaction_reverses_what_is_stored(self):
+        created = InventoryTransaction.objects.create(
+            item_stock=self.stocks,
+            user=self.user,
+            quantity=2,
+            transaction_type=InventoryTransaction.ADD,
+        )
+        first = InventoryTransaction.objects.get(pk=created.pk)
+        second = InventoryTransaction.objects.get(pk=created.pk)
+        first.quantity = 5
+        first.save()
+        second.quantity = 4
+        second.save()
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 9)
+
+        # A save rolled back by the caller leaves the instance ahead of the row.
+        try:
+            with db_transaction.atomic():
+                second.quantity = 1
+                second.save()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        second.quantity = 3
+        second.save()
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 8)
+
+        # Refreshing re-remembers the stored posting, so the edit goes
+        # straight through the guarded UPDATE.
+        first.refresh_from_db()
+        self.assertEqual(first._posted, (self.stocks.id, InventoryTransaction.ADD, 3))
+
+    def test_moving_transaction_between_lots(self):
+        other_lot = InventoryStock.objects.create(
+            item=self.item,
+            count=0,
+            expiration_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        transaction = InventoryTransaction.objects.create(
+            item_stock=self.stocks,
+            user=self.user,
+            quantity=3,
+            transaction_type=InventoryTransaction.ADD,
+        )
+        transaction.item_stock = other_lot
+        transaction.save()
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 5)
+        self.assertEqual(InventoryStock.objects.get(id=other_lot.id).count, 3)
+
+
+class BulkPostTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        create_test_stock(self)
+        self.other_stock = InventoryStock.objects.create(
+            item=self.item,
+            count=10,
+            expiration_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        self.user = CustomUser.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def posting(self, stock, quantity, transaction_type):
+        return InventoryTransaction(
+            item_stock=stock,
+            user=self.user,
+            quantity=quantity,
+            transaction_type=transaction_type,
+        )
+
+    def test_bulk_post_applies_net_deltas(self):
+        created = InventoryTransaction.objects.bulk_post([
+            self.posting(self.stocks, 4, InventoryTransaction.ADD),
+            self.posting(self.stocks, 7, InventoryTransaction.REMOVE),
+            self.posting(self.other_stock, 10, InventoryTransaction.REMOVE),
+        ])
+        self.assertEqual(len(created), 3)
+        self.assertEqual(InventoryTransaction.objects.count(), 3)
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 2)
+        self.assertEqual(InventoryStock.objects.get(id=self.other_stock.id).count, 0)
+
+    def test_bulk_post_query_count_is_independent_of_batch_size(self):
+        postings = [self.posting(self.stocks, 1, InventoryTransaction.ADD) for _ in range(50)]
+        postings += [self.posting(self.other_stock, 1, InventoryTransaction.REMOVE) for _ in range(5)]
+        with CaptureQueriesContext(connection) as ctx:
+            InventoryTransaction.objects.bulk_post(postings)
+        statements = [q["sql"].split()[0] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(statements, ["UPDATE", "UPDATE", "INSERT", "INSERT"])
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 55)
+        self.assertEqual(InventoryStock.objects.get(id=self.other_stock.id).count, 5)
+
+    def test_bulk_post_rolls_back_on_shortfall(self):
+        with self.assertRaises(InsufficientStock):
+            InventoryTransaction.objects.bulk_post([
+                self.posting(self.stocks, 5, InventoryTransaction.ADD),
+                self.posting(self.other_stock, 11, InventoryTransaction.REMOVE),
+            ])
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 5)
+        self.assertEqual(InventoryStock.objects.get(id=self.other_stock.id).count, 10)
+        self.assertEqual(InventoryTransaction.objects.count(), 0)
+
+    def test_bulk_posted_transaction_can_be_deleted(self):
+        [posted] = InventoryTransaction.objects.bulk_post([
+            self.posting(self.stocks, 3, InventoryTransaction.REMOVE),
+        ])
+        posted.delete()
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 5)
+
+
+class DispenseTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        create_test_stock(self)
+        today = datetime.date.today()
+        self.later_lot = InventoryStock.objects.create(
+            item=self.item,
+            count=10,
+            expiration_date=today + datetime.timedelta(days=60),
+        )
+        self.sooner_lot = InventoryStock.objects.create(
+            item=self.item,
+            count=4,
+            expiration_date=today + datetime.timedelta(days=30),
+        )
+        self.expired_lot = InventoryStock.objects.create(
+            item=self.item,
+            count=20,
+            expiration_date=today + datetime.timedelta(days=1),
+        )
+        InventoryStock.objects.filter(id=self.expired_lot.id).update(
+            expiration_date=today - datetime.timedelta(days=1)
+        )
+        self.user = CustomUser.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def counts(self):
+        return dict(InventoryStock.objects.values_list("id", "count"))
+
+    def test_dispense_consumes_earliest_expiry_first(self):
+        postings = dispense(self.item, 12, self.user)
+        self.assertEqual(
+            [(p.item_stock_id, p.quantity) for p in postings],
+            [(self.stocks.id, 5), (self.sooner_lot.id, 4), (self.later_lot.id, 3)],
+        )
+        counts = self.counts()
+        self.assertEqual(counts[self.stocks.id], 0)
+        self.assertEqual(counts[self.sooner_lot.id], 0)
+        self.assertEqual(counts[self.later_lot.id], 7)
+        self.assertEqual(counts[self.expired_lot.id], 20)
+
+    def test_dispense_is_select_update_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            dispense(self.item, 7, self.user)
+        statements = [q["sql"].split()[0] for q in ctx.captured_queries if "SAVEPOINT" not in q["sql"]]
+        self.assertEqual(statements, ["SELECT", "UPDATE", "UPDATE", "INSERT", "INSERT"])
+
+    def test_dispense_never_touches_expired_lots(self):
+        with self.assertRaises(InsufficientStock):
+            dispense(self.item, 20, self.user)
+        self.assertEqual(self.counts()[self.expired_lot.id], 20)
+        self.assertEqual(InventoryTransaction.objects.count(), 0)
+
+
+class ApiTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        today = datetime.date.today()
+        self.sooner_lot = InventoryStock.objects.create(
+            item=self.item,
+            count=4,
+            expiration_date=today + datetime.timedelta(days=30),
+        )
+        self.later_lot = InventoryStock.objects.create(
+            item=self.item,
+            count=10,
+            expiration_date=today + datetime.timedelta(days=60),
+        )
+        self.user = CustomUser.objects.create_user(
+            email="test_email@example.com",
+            password="1234",
+            is_staff=True,
+        )
+
+    def url(self, name):
+        return reverse(f"medicines:{name}", args=[self.item.pk])
+
+    async def post(self, name, body):
+        return await self.async_client.post(self.url(name), body, content_type="application/json")
+
+    async def test_requires_staff(self):
+        response = await self.async_client.get(self.url("api-item"))
+        self.assertEqual(response.status_code, 403)
+
+    async def test_item_and_lots(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url("api-item"))
+        self.assertEqual(response.status_code, 200)
+        record = response.json()
+        self.assertEqual(record["id"], str(self.item.pk))
+        self.assertEqual(record["category"], CategoryType.ANTACIDS)
+        self.assertEqual((record["on_hand"], record["sellable"]), (14, 14))
+
+        response = await self.async_client.get(self.url("api-item-lots"))
+        self.assertEqual(
+            [(lot["id"], lot["count"]) for lot in response.json()["lots"]],
+            [(self.sooner_lot.id, 4), (self.later_lot.id, 10)],
+        )
+        missing = reverse("medicines:api-item-lots", args=[uuid.uuid4()])
+        self.assertEqual((await self.async_client.get(missing)).status_code, 404)
+
+    async def test_receive_and_dispense(self):
+        await self.async_client.aforce_login(self.user)
+        expiry = datetime.date.today() + datetime.timedelta(days=90)
+        response = await self.post("api-receive", {"quantity": 6, "expiration_date": expiry.isoformat()})
+        self.assertEqual(response.status_code, 201)
+        new_lot = await InventoryStock.objects.aget(item=self.item, expiration_date=expiry)
+        self.assertEqual((response.json()["lot"], new_lot.count), (new_lot.id, 6))
+
+        response = await self.post("api-dispense", {"quantity": 5})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            [(t["lot"], t["quantity"]) for t in response.json()["transactions"]],
+            [(self.sooner_lot.id, 4), (self.later_lot.id, 1)],
+        )
+        self.assertEqual((await self.post("api-dispense", {"quantity": 100})).status_code, 409)
+        self.assertEqual((await self.post("api-dispense", {"quantity": "5"})).status_code, 400)
+        self.assertEqual((await self.post("api-receive", {"quantity": 1})).status_code, 400)
+        self.assertEqual(await InventoryTransaction.objects.acount(), 3)
+
+        # An existing lot that has since expired takes no more deliveries.
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        await InventoryStock.objects.filter(pk=new_lot.pk).aupdate(expiration_date=yesterday)
+        response = await self.post("api-receive", {"quantity": 1, "expiration_date": yesterday.isoformat()})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Cannot add stock with an expiration date in the past.")
+        self.assertEqual((await InventoryStock.objects.aget(pk=new_lot.pk)).count, 6)
+        self.assertEqual(await InventoryTransaction.objects.acount(), 3)
+
+    async def test_gtin_lookup(self):
+        await InventoryItem.objects.filter(pk=self.item.pk).aupdate(gtin="04006381333931")
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(
+            reverse("medicines:api-gtins"),
+            {"gtins": ["4006381333931", "0000000000000", "12345"]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual(result["items"]["4006381333931"]["id"], str(self.item.pk))
+        self.assertEqual((result["missing"], result["invalid"]), (["0000000000000"], ["12345"]))
+
+
+class SweepExpiredTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        create_test_stock(self)
+        today = datetime.date.today()
+        self.expired_lot = self.expired(today - datetime.timedelta(days=1), 20)
+        self.old_lot = self.expired(today - datetime.timedelta(days=30), 3)
+        Watermark.objects.advance(EXPIRY_SWEEP, today - datetime.timedelta(days=7))
+
+    def expired(self, expiration_date, count):
+        lot = InventoryStock.objects.create(
+            item=self.item,
+            count=count,
+            expiration_date=datetime.date.today() + datetime.timedelta(days=count),
+        )
+        InventoryStock.objects.filter(pk=lot.pk).update(expiration_date=expiration_date)
+        return lot
+
+    def sweep(self, *args):
+        stdout = StringIO()
+        call_command("sweep_expired", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def counts(self):
+        return dict(InventoryStock.objects.values_list("id", "count"))
+
+    def test_sweep_writes_off_lots_expired_since_the_last_run(self):
+        self.assertIn("Would write off 20 units in 1 expired lots.", self.sweep("--dry-run"))
+        self.assertIn("Wrote off 20 units in 1 expired lots.", self.sweep())
+        self.assertEqual(
+            self.counts(), {self.stocks.pk: 5, self.expired_lot.pk: 0, self.old_lot.pk: 3}
+        )
+        write_off = InventoryTransaction.objects.get()
+        self.assertEqual(
+            (write_off.transaction_type, write_off.quantity, write_off.user.email),
+            (InventoryTransaction.WRITE_OFF, 20, SYSTEM_USER_EMAIL),
+        )
+        self.assertEqual(StockSummary.objects.get(item=self.item).total, 8)
+        self.assertEqual(reports.days_of_cover()[0].consumed, 0)
+
+        # Nothing new has expired, so the next run reads no lots at all.
+        self.assertIn("Wrote off 0 units in 0 expired lots.", self.sweep())
+        self.assertIn("Wrote off 3 units in 1 expired lots.", self.sweep("--full"))
+        self.assertEqual(InventoryTransaction.objects.count(), 2)
+
+    def test_sweep_posts_in_batches(self):
+        self.old_lot.delete()
+        next_year = datetime.date.today() + datetime.timedelta(days=365)
+        lots, quantity = write_off_expired(CustomUser.objects.system_user(), today=next_year, batch_size=1)
+        self.assertEqual((lots, quantity), (2, 25))
+        self.assertEqual(set(self.counts().values()), {0})
+
+
+class StockSummaryTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        create_test_stock(self)
+        self.user = CustomUser.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def summary(self):
+        return StockSummary.objects.get(item=self.item)
+
+    def test_summary_tracks_lot_rows(self):
+        self.assertEqual(self.summary().total, 5)
+        InventoryStock.objects.all().delete()
+        StockSummary.objects.rebuild()
+        self.assertEqual(self.summary().total, 0)
+
+    def test_transactions_move_summary(self):
+        transaction = InventoryTransaction.objects.create(
+            item_stock=self.stocks,
+            user=self.user,
+            quantity=3,
+            transaction_type=InventoryTransaction.REMOVE,
+        )
+        self.assertEqual(self.summary().total, 2)
+        transaction.quantity = 1
+        transaction.save()
+        self.assertEqual(self.summary().total, 4)
+        transaction.delete()
+        self.assertEqual(self.summary().total, 5)
+        self.assertFalse(StockSummary.objects.mismatched().exists())
+
+    def test_expired_lots_split_from_sellable(self):
+        InventoryStock.objects.create(
+            item=self.item,
+            count=7,
+            expiration_date=datetime.date.today() + datetime.timedelta(days=10),
+        )
+        StockSummary.objects.rebuild(as_of=datetime.date.today() + datetime.timedelta(days=5))
+        summary = self.summary()
+        self.assertEqual((summary.total, summary.expired, summary.sellable), (12, 5, 7))
+
+        InventoryTransaction.objects.create(
+            item_stock=self.stocks,
+            user=self.user,
+            quantity=2,
+            transaction_type=InventoryTransaction.REMOVE,
+        )
+        summary = self.summary()
+        self.assertEqual((summary.total, summary.expired, summary.sellable), (10, 3, 7))
+
+    def test_moving_a_lot_recounts_both_items(self):
+        other_item = InventoryItem.objects.create(
+            category=self.item.category,
+            subcategory=self.item.subcategory,
+            item_name="Aluminium Hydroxide",
+            brand_name="Brand",
+            generic_name="Aluminium Hydroxide",
+            dosage_form="Liquid",
+            packaging=self.item.packaging,
+            quantity=1,
+        )
+        self.stocks.item = other_item
+        self.stocks.save()
+        self.assertEqual(self.summary().total, 0)
+        self.assertEqual(StockSummary.objects.get(item=other_item).total, 5)
+        self.assertFalse(StockSummary.objects.mismatched().exists())
+
+    def test_verify_command_reports_and_rebuild_repairs_drift(self):
+        StockSummary.objects.filter(item=self.item).update(total=99)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_stock_summary", verify=True, stdout=StringIO())
+        call_command("rebuild_stock_summary", stdout=StringIO())
+        call_command("rebuild_stock_summary", verify=True, stdout=StringIO())
+        self.assertEqual(self.summary().total, 5)
+
+
+class StockLedgerTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        create_test_stock(self)
+        self.user = CustomUser.objects.create_user(
+            email="test_email@example.com",
+            password="1234"
+        )
+
+    def post(self, quantity, when, transaction_type=InventoryTransaction.REMOVE):
+        with mock.patch("django.utils.timezone.now", return_value=when):
+            InventoryTransaction.objects.create(
+                item_stock=self.stocks,
+                user=self.user,
+                quantity=quantity,
+                transaction_type=transaction_type,
+            )
+
+    def test_every_count_change_is_appended(self):
+        self.post(2, timezone.now())
+        self.stocks.refresh_from_db()
+        self.stocks.count = 10
+        self.stocks.save()
+        deltas = list(StockMovement.objects.filter(stock=self.stocks).order_by("pk").values_list("delta", flat=True))
+        self.assertEqual(deltas, [5, -2, 7])
+        self.assertEqual(sum(deltas), InventoryStock.objects.get(pk=self.stocks.pk).count)
+        with self.assertRaises(ValueError):
+            StockMovement.objects.first().save()
+
+    def test_balance_as_of_uses_snapshot_and_later_movements(self):
+        today = timezone.localdate()
+        days_ago = lambda days: timezone.now() - datetime.timedelta(days=days)
+        StockMovement.objects.update(created_at=days_ago(10))
+        self.post(1, days_ago(6))
+        self.post(3, days_ago(4), InventoryTransaction.ADD)
+
+        self.assertEqual(StockSnapshot.objects.roll_up(today - datetime.timedelta(days=5)), 2)
+        self.post(2, days_ago(2))
+        balance = lambda days: StockSnapshot.objects.balance_as_of(self.stocks.pk, today - datetime.timedelta(days=days))
+        self.assertEqual([balance(11), balance(8), balance(5), balance(3), balance(0)], [0, 5, 4, 7, 5])
+        # Rolling up again only covers the days since the last run.
+        self.assertEqual(StockSnapshot.objects.roll_up(today - datetime.timedelta(days=1)), 2)
+        self.assertEqual(balance(3), 7)
+        with self.assertRaises(ValueError):
+            StockSnapshot.objects.roll_up(today)
+
+    def test_stock_as_of_sums_lot_balances(self):
+        today = timezone.localdate()
+        days_ago = lambda days: timezone.now() - datetime.timedelta(days=days)
+        StockMovement.objects.update(created_at=days_ago(10))
+        other = InventoryStock.objects.create(
+            item=self.item, count=8, expiration_date=today + datetime.timedelta(days=60)
+        )
+        StockMovement.objects.filter(stock=other).update(created_at=days_ago(7))
+        self.post(1, days_ago(6))
+        StockSnapshot.objects.roll_up(today - datetime.timedelta(days=1))
+        self.post(2, timezone.now())
+        stock = lambda days: reports.stock_as_of(self.item, today - datetime.timedelta(days=days))
+        self.assertEqual([stock(11), stock(9), stock(7), stock(3), stock(0)], [0, 5, 13, 12, 10])
+        # Rolled-up days read snapshots only; later days add their movements.
+        with self.assertNumQueries(2):
+            stock(3)
+
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("medicines:api-item-stock", args=[self.item.pk]), {"date": today.isoformat()}
+        )
+        self.assertEqual(response.json()["quantity"], 10)
+        self.assertEqual(response.json()["lots"], [{"id": self.stocks.pk, "balance": 2}, {"id": other.pk, "balance": 8}])
+
+    def test_deleting_a_lot_keeps_earlier_balances(self):
+        today = timezone.localdate()
+        yesterday = today - datetime.timedelta(days=1)
+        StockMovement.objects.update(created_at=timezone.now() - datetime.timedelta(days=10))
+        self.post(1, timezone.now() - datetime.timedelta(days=6))
+        StockSnapshot.objects.roll_up(today - datetime.timedelta(days=3))
+        self.post(2, timezone.now() - datetime.timedelta(days=2))
+        stock = lambda days: reports.stock_as_of(self.item, today - datetime.timedelta(days=days))
+        before = [stock(7), stock(5), stock(1)]
+        self.assertEqual(before, [5, 4, 2])
+
+        lot = self.stocks.pk
+        self.stocks.delete()
+        self.assertEqual([stock(7), stock(5), stock(1)], before)
+        self.assertEqual(StockSnapshot.objects.balance_as_of(lot, yesterday), 2)
+        self.assertEqual(stock(0), 0)
+        self.assertEqual(StockSnapshot.objects.balance_as_of(lot, today), 0)
+
+    def test_compact_command_keeps_balances(self):
+        today = timezone.localdate()
+        StockMovement.objects.update(created_at=timezone.now() - datetime.timedelta(days=40))
+        self.post(1, timezone.now() - datetime.timedelta(days=20))
+        self.post(2, timezone.now())
+        call_command("compact_ledger", keep_days=30, stdout=StringIO())
+        self.assertEqual(StockMovement.objects.count(), 2)
+        balances = [
+            StockSnapshot.objects.balance_as_of(self.stocks.pk, today - datetime.timedelta(days=days))
+            for days in (35, 10, 0)
+        ]
+        self.assertEqual(balances, [5, 4, 2])
+        with self.assertRaises(ValueError):
+            StockMovement.objects.compact(today + datetime.timedelta(days=1))
+
+
+class ArchiveTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        create_test_stock(self)
+        self.user = CustomUser.objects.create_user(
+            email="test_email@example.com",
+            password="1234",
+            is_staff=True,
+        )
+        for days, quantity in ((400, 1), (380, 2), (10, 1)):
+            InventoryTransaction.objects.create(
+                item_stock=self.stocks,
+                user=self.user,
+                quantity=quantity,
+                transaction_type=InventoryTransaction.REMOVE,
+                created_at=timezone.now() - datetime.timedelta(days=days),
+            )
+
+    def test_archiving_moves_rows_without_touching_stock(self):
+        old_ids = list(InventoryTransaction.objects.order_by("created_at").values_list("pk", flat=True)[:2])
+        stdout = StringIO()
+        call_command("archive_transactions", batch_size=1, stdout=stdout)
+        self.assertIn("Archived 2 transactions", stdout.getvalue())
+        self.assertEqual(InventoryTransaction.objects.count(), 1)
+        self.assertEqual(
+            list(ArchivedTransaction.objects.order_by("created_at").values_list("id", "item_id", "quantity")),
+            [(old_ids[0], uuid.UUID(self.item.pk), 1), (old_ids[1], uuid.UUID(self.item.pk), 2)],
+        )
+        self.assertEqual(InventoryStock.objects.get(pk=self.stocks.pk).count, 1)
+        self.assertFalse(StockSummary.objects.mismatched().exists())
+        self.assertEqual(StockSnapshot.objects.balance_as_of(self.stocks.pk, timezone.localdate()), 1)
+        # Archived rows survive the lot they were posted against.
+        self.stocks.delete()
+        self.assertEqual(ArchivedTransaction.objects.count(), 2)
+        with self.assertRaises(ValueError):
+            ArchivedTransaction.objects.first().save()
+
+    def test_archive_api_pages_through_history(self):
+        call_command("archive_transactions", older_than_days=5, stdout=StringIO())
+        self.client.force_login(self.user)
+        url = reverse("medicines:api-item-archive", args=[self.item.pk])
+        with mock.patch("medicines.api.ARCHIVE_PAGE_SIZE", 2):
+            first = self.client.get(url).json()
+            self.assertEqual([row["quantity"] for row in first["transactions"]], [1, 2])
+            rest = self.client.get(url, {"after": first["next"]}).json()
+        self.assertEqual(([row["quantity"] for row in rest["transactions"]], rest["next"]), ([1], None))
+        since = (timezone.localdate() - datetime.timedelta(days=390)).isoformat()
+        recent = self.client.get(url, {"since": since}).json()
+        self.assertEqual([row["quantity"] for row in recent["transactions"]], [2, 1])
+        self.assertEqual(self.client.get(url, {"since": "last year"}).status_code, 400)
+
+
+class ImportInventoryTestCase(TestCase):
+    HEADER = "category,subcategory,item_name,brand_name,generic_name,dosage_form,strength_per_size,packaging,quantity,unit_size\n"
+
+    def import_rows(self, *lines):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as handle:
+            handle.write(self.HEADER + "".join(line + "\n" for line in lines))
+        self.addCleanup(os.remove, handle.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command("import_inventory", handle.name, batch_size=2, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_creates_items_and_summaries(self):
+        stdout, stderr = self.import_rows(
+            "Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,400mg/5ml,Bottle,120,ml",
+            "Pain Relievers,Analgesics,Paracetamol,Biogesic,Paracetamol,Tablet,500mg,10_per_blister,10,Tablets",
+            "Eye Care,Eye Care,Eye Drops,Visine,Tetrahydrozoline,Drops,,1_bottle,1,",
+        )
+        self.assertEqual(stderr, "")
+        self.assertIn("Imported 3 items, 0 rows failed, 0 duplicate rows merged (3 rows read).", stdout)
+        self.assertEqual(InventoryItem.objects.get(brand_name="Phillips").packaging.value, PackagingType.BOTTLE)
+        self.assertEqual(InventoryItem.objects.get(brand_name="Visine").unit_size.value, UnitType.EACH)
+        self.assertEqual(StockSummary.objects.count(), 3)
+
+    def test_duplicate_rows_are_merged_and_counted(self):
+        stdout, stderr = self.import_rows(
+            "Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,400mg/5ml,Bottle,120,ml",
+            "Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,400mg/5ml,Bottle,240,ml",
+            "Antacids,Antacid,Other,Brand,Generic,Liquid,,Bottle,lots,ml",
+        )
+        self.assertIn("Imported 1 items, 1 rows failed, 1 duplicate rows merged (3 rows read).", stdout)
+        self.assertEqual(InventoryItem.objects.get().quantity, 240)
+
+    def test_reimport_updates_instead_of_duplicating(self):
+        self.import_rows("Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,400mg/5ml,Bottle,120,ml")
+        self.import_rows("Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,400mg/5ml,Bottle,240,ml")
+        self.assertEqual(InventoryItem.objects.get().quantity, 240)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        stdout, stderr = self.import_rows(
+            "Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,400mg/5ml,Bottle,120,ml",
+            "Not A Category,Antacid,Thing,Brand,Generic,Liquid,,Bottle,1,ml",
+            "Antacids,Antacid,Other,Brand,Generic,Liquid,,Bottle,lots,ml",
+        )
+        self.assertIn("line 3: Invalid Category type: Not A Category", stderr)
+        self.assertIn("line 4: Invalid quantity: 'lots'", stderr)
+        self.assertIn("Imported 1 items, 2 rows failed, 0 duplicate rows merged (3 rows read).", stdout)
+        self.assertEqual(InventoryItem.objects.count(), 1)
+
+    def test_gtin_column_sets_barcodes(self):
+        self.HEADER = ImportInventoryTestCase.HEADER.replace("\n", ",gtin\n")
+        stdout, stderr = self.import_rows(
+            "Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,400mg/5ml,Bottle,120,ml,4006381333931",
+            "Antacids,Antacid,Other,Brand,Generic,Liquid,,Bottle,1,ml,4006381333932",
+        )
+        self.assertIn("line 3: Invalid GTIN check digit: 04006381333932", stderr)
+        self.assertEqual(InventoryItem.objects.get().gtin, "04006381333931")
+        self.HEADER = ImportInventoryTestCase.HEADER
+        self.import_rows("Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,400mg/5ml,Bottle,240,ml")
+        self.assertEqual(InventoryItem.objects.get().gtin, "04006381333931")
+
+    def test_duplicate_gtins_reject_only_their_rows(self):
+        self.HEADER = ImportInventoryTestCase.HEADER.replace("\n", ",gtin\n")
+        self.import_rows("Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,400mg/5ml,Bottle,120,ml,4006381333931")
+        stdout, stderr = self.import_rows(
+            "Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,400mg/5ml,Bottle,240,ml,4006381333931",
+            "Antacids,Antacid,Other,Brand,Generic,Liquid,,Bottle,1,ml,4006381333931",
+            "Antacids,Antacid,Third,Brand,Generic,Liquid,,Bottle,1,ml,96385074",
+            "Antacids,Antacid,Fourth,Brand,Generic,Liquid,,Bottle,1,ml,96385074",
+            "Antacids,Antacid,Fifth,Brand,Generic,Liquid,,Bottle,1,ml,",
+        )
+        self.assertIn("line 3: GTIN 04006381333931 already belongs to item", stderr)
+        self.assertIn("line 4: GTIN 00000096385074 is also on line 5", stderr)
+        self.assertIn("line 5: GTIN 00000096385074 is also on line 4", stderr)
+        self.assertIn("Imported 2 items, 3 rows failed, 0 duplicate rows merged (5 rows read).", stdout)
+        self.assertEqual(
+            sorted(InventoryItem.objects.values_list("item_name", "quantity", "gtin")),
+            [("Fifth", 1, None), ("Milk of Magnesia", 240, "04006381333931")],
+        )
+
+    def test_ids_must_be_uuids(self):
+        item_id = uuid.uuid4()
+        self.HEADER = "id," + ImportInventoryTestCase.HEADER
+        stdout, stderr = self.import_rows(
+            f"{item_id},Antacids,Antacid,Milk of Magnesia,Phillips,Magnesium Hydroxide,Liquid,,Bottle,120,ml",
+            "MED-0001,Antacids,Antacid,Other,Brand,Generic,Liquid,,Bottle,1,ml",
+        )
+        self.assertIn("line 3: Invalid id: 'MED-0001'", stderr)
+        self.assertEqual(InventoryItem.objects.get().pk, item_id)
+
+
+class ExportInventoryTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        create_test_stock(self)
+        self.later = InventoryStock.objects.create(
+            item=self.item,
+            count=3,
+            expiration_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        self.staff = CustomUser.objects.create_user(
+            email="staff@example.com",
+            password="1234",
+            is_staff=True,
+        )
+
+    def export(self, **params):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("medicines:export"), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_csv_export_has_one_row_per_lot(self):
+        header, *rows = list(csv.reader(self.export()))
+        self.assertEqual(header[:2], ["id", "category"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(
+            [(row[header.index("lot_count")], row[header.index("total")]) for row in rows],
+            [("5", "8"), ("3", "8")],
+        )
+
+    def test_jsonl_export(self):
+        records = [json.loads(line) for line in self.export(format="jsonl")]
+        self.assertEqual([record["lot_id"] for record in records], [self.stocks.id, self.later.id])
+        self.assertEqual(records[0]["item_name"], "Magnesium Hydroxide")
+
+    def test_export_requires_staff(self):
+        response = self.client.get(reverse("medicines:export"))
+        self.assertEqual(response.status_code, 302)
+
+
+class ReportTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        create_test_stock(self)
+        today = datetime.date.today()
+        self.later = InventoryStock.objects.create(
+            item=self.item,
+            count=20,
+            expiration_date=today + datetime.timedelta(weeks=3),
+        )
+        self.user = CustomUser.objects.create_user(
+            email="test_email@example.com",
+            password="1234",
+            is_staff=True,
+        )
+        dispense(self.item, 6, self.user)
+        old = InventoryTransaction.objects.create(
+            item_stock=self.later,
+            user=self.user,
+            quantity=4,
+            transaction_type=InventoryTransaction.REMOVE,
+        )
+        InventoryTransaction.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - datetime.timedelta(days=90)
+        )
+
+    def test_expiry_by_category_week(self):
+        rows = reports.expiry_by_category_week(weeks=4)
+        self.assertEqual(sum(row.quantity for row in rows), 15)
+        self.assertEqual({row.category for row in rows}, {CategoryType.ANTACIDS})
+
+    def test_days_of_cover_uses_window_consumption(self):
+        [cover] = reports.days_of_cover(window_days=30)
+        self.assertEqual((cover.sellable, cover.consumed), (15, 6))
+        self.assertAlmostEqual(cover.days_of_cover, 15 / (6 / 30))
+
+    def test_report_view_and_command(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("medicines:report"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Magnesium Hydroxide")
+
+        stdout = StringIO()
+        call_command("inventory_report", json=True, stdout=stdout)
+        self.assertEqual(json.loads(stdout.getvalue())["cover"][0]["consumed"], 6)
+
+
+class ReorderAlertTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        self.stocks = InventoryStock.objects.create(
+            item=self.item,
+            count=5,
+            expiration_date=datetime.date.today() + datetime.timedelta(days=30),
+        )
+        self.user = CustomUser.objects.create_user(
+            email="test_email@example.com",
+            password="1234",
+            is_staff=True,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.reorder_point = 10
+            self.item.save()
+
+    def alert(self):
+        return ReorderAlert.objects.filter(item=self.item).values_list("sellable", "shortfall").first()
+
+    def test_postings_move_the_alert(self):
+        self.assertEqual(self.alert(), (5, 5))
+        with self.captureOnCommitCallbacks(execute=True):
+            dispense(self.item, 2, self.user)
+        self.assertEqual(self.alert(), (3, 7))
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryTransaction.objects.create(
+                item_stock=self.stocks,
+                user=self.user,
+                quantity=20,
+                transaction_type=InventoryTransaction.ADD,
+            )
+        self.assertIsNone(self.alert())
+
+    def test_bulk_lot_deletes_move_summary_and_alert(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            other = InventoryStock.objects.create(
+                item=self.item, count=20, expiration_date=datetime.date.today() + datetime.timedelta(days=60)
+            )
+        self.assertIsNone(self.alert())
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryStock.objects.filter(pk=other.pk).delete()
+        self.assertEqual(StockSummary.objects.get(item=self.item).total, 5)
+        self.assertEqual(self.alert(), (5, 5))
+
+        self.user.is_superuser = True
+        self.user.save()
+        self.client.force_login(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("admin:medicines_inventorystock_changelist"), {
+                "action": "delete_selected",
+                "_selected_action": [self.stocks.pk],
+                "post": "yes",
+            })
+        self.assertFalse(InventoryStock.objects.exists())
+        self.assertEqual(StockSummary.objects.get(item=self.item).total, 0)
+        self.assertEqual(self.alert(), (0, 10))
+        self.assertFalse(StockSummary.objects.mismatched().exists())
+
+    def test_only_touched_items_are_reevaluated(self):
+        StockSummary.objects.filter(item=self.item).update(total=50)
+        with self.captureOnCommitCallbacks(execute=True):
+            ReorderAlert.objects.refresh(item_ids=[uuid.uuid4()])
+        self.assertEqual(self.alert(), (5, 5))
+        ReorderAlert.objects.refresh()
+        self.assertIsNone(self.alert())
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("rebuild_stock_summary", stdout=StringIO())
+        self.assertEqual(self.alert(), (5, 5))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.reorder_point = None
+            self.item.save()
+        self.assertIsNone(self.alert())
+
+    def test_dashboard_query_count_does_not_grow(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as one_alert:
+            response = self.client.get(reverse("medicines:reorder"))
+        self.assertContains(response, "Magnesium Hydroxide")
+        for n in range(3):
+            InventoryItem.objects.create(
+                category=self.item.category,
+                subcategory=self.item.subcategory,
+                item_name=f"Item {n}",
+                brand_name="Brand",
+                generic_name="Generic",
+                dosage_form="Tablet",
+                packaging=self.item.packaging,
+                quantity=1,
+                reorder_point=1,
+            )
+        ReorderAlert.objects.refresh()
+        with self.assertNumQueries(len(one_alert)):
+            response = self.client.get(reverse("medicines:reorder"))
+        self.assertContains(response, "4 items to reorder")
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        self.paracetamol = InventoryItem.objects.create(
+            category=Category.objects.get_for(CategoryType.PAIN_RELIEVERS),
+            subcategory=Subcategory.objects.get_for(SubcategoryType.ANALGESICS),
+            item_name="Paracetamol 500mg",
+            brand_name="Biogesic",
+            generic_name="Paracetamol",
+            dosage_form="Tablet",
+            packaging=Packaging.objects.get_for(PackagingType.TEN_PER_BLISTER),
+            quantity=10,
+            unit_size=Unit.objects.get_for(UnitType.TABLETS),
+        )
+
+    def found(self, q):
+        return [item.item_name for item in search.search(q)]
+
+    def test_search_matches_prefixes_of_any_name(self):
+        self.assertEqual(self.found("magn"), [self.item.item_name])
+        self.assertEqual(self.found("Phillips milk"), [self.item.item_name])
+        self.assertEqual(self.found("bioges"), [self.paracetamol.item_name])
+        self.assertEqual(self.found("nothing like it"), [])
+        self.assertEqual(self.found("  "), [])
+
+    def test_item_name_hits_rank_above_generic_name_hits(self):
+        generic_only = InventoryItem.objects.create(
+            category=Category.objects.get_for(CategoryType.PAIN_RELIEVERS),
+            subcategory=Subcategory.objects.get_for(SubcategoryType.ANALGESICS),
+            item_name="Fever Syrup",
+            brand_name="Tempra",
+            generic_name="Paracetamol",
+            dosage_form="Syrup",
+            packaging=Packaging.objects.get_for(PackagingType.BOTTLE),
+            quantity=60,
+            unit_size=Unit.objects.get_for(UnitType.ML),
+        )
+        self.assertEqual(self.found("paracetamol"), [self.paracetamol.item_name, generic_only.item_name])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.paracetamol.brand_name = "Calpol"
+        self.paracetamol.save()
+        self.assertEqual(self.found("biogesic"), [])
+        self.assertEqual(self.found("calpol"), [self.paracetamol.item_name])
+        self.paracetamol.delete()
+        self.assertEqual(self.found("calpol"), [])
+
+    def test_search_without_fts_table_matches_every_word(self):
+        with mock.patch.object(search, "has_fts_table", return_value=False):
+            self.assertEqual(self.found("phillips milk"), [self.item.item_name])
+            self.assertEqual(self.found("phillips paracetamol"), [])
+
+    def test_type_ahead_endpoint(self):
+        staff = CustomUser.objects.create_user(email="staff@example.com", password="1234", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse("medicines:search"), {"q": "para"})
+        self.assertEqual(
+            [result["item_name"] for result in response.json()["results"]],
+            ["Paracetamol 500mg"],
+        )
+
+
+class CatalogueCacheTestCase(TestCase):
+    def setUp(self):
+        catalogue.cache().clear()
+        create_test_item(self)
+        # Behave as one request, which reads the version once.
+        catalogue.start_request()
+        self.addCleanup(catalogue.finish_request)
+
+    def test_reads_are_served_from_cache(self):
+        self.assertEqual(catalogue.items([self.item.pk, "missing"]).keys(), {str(self.item.pk)})
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogue.item(self.item.pk)["brand_name"], "Phillips' Milk of Magnesia")
+            self.assertEqual(catalogue.items([self.item.pk, "missing"]).keys(), {str(self.item.pk)})
+        self.assertEqual(len(catalogue.category(CategoryType.ANTACIDS)), 1)
+        with self.assertNumQueries(0):
+            catalogue.category(CategoryType.ANTACIDS)
+
+    def test_basket_of_gtins_is_one_query(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.gtin = "4006381333931"
+            self.item.save()
+        basket = ["04006381333931", "00000000000000", "00000096385074"]
+        # The new version, then one IN query for the whole basket.
+        with self.assertNumQueries(2):
+            self.assertEqual(catalogue.by_gtin(basket).keys(), {"04006381333931"})
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogue.by_gtin(basket)["04006381333931"]["id"], uuid.UUID(self.item.pk))
+
+    def test_save_and_delete_retire_cached_records(self):
+        catalogue.category(CategoryType.ANTACIDS)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.item_name = "Milk of Magnesia"
+            self.item.save()
+        self.assertEqual(catalogue.item(self.item.pk)["item_name"], "Milk of Magnesia")
+        self.assertEqual(catalogue.category(CategoryType.ANTACIDS)[0]["item_name"], "Milk of Magnesia")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.delete()
+        self.assertIsNone(catalogue.item(self.item.pk))
+        self.assertEqual(catalogue.category(CategoryType.ANTACIDS), [])
+
+    def test_version_is_shared_through_the_database(self):
+        catalogue.item(self.item.pk)
+        # An edit committed by another process, which bumps the version there.
+        InventoryItem.objects.filter(pk=self.item.pk).update(item_name="Milk of Magnesia")
+        Counter.objects.bump(catalogue.VERSION_COUNTER)
+        with self.assertNumQueries(0):
+            self.assertEqual(catalogue.item(self.item.pk)["item_name"], "Magnesium Hydroxide")
+        catalogue.start_request()
+        self.assertEqual(catalogue.item(self.item.pk)["item_name"], "Milk of Magnesia")
+        catalogue.finish_request()
+        with self.assertNumQueries(1):
+            catalogue.version()
+
+
+class AdminChangelistTestCase(TestCase):
+    def setUp(self):
+        create_test_item(self)
+        create_test_stock(self)
+        self.admin = CustomUser.objects.create_superuser(email="admin@example.com", password="1234")
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, model_name):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse(f"admin:medicines_{model_name}_changelist"))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_transaction_changelist_query_count_is_fixed(self):
+        InventoryTransaction.objects.bulk_post(
+            InventoryTransaction(
+                item_stock=self.stocks,
+                user=self.admin,
+                quantity=1,
+                transaction_type=InventoryTransaction.ADD,
+            )
+            for _ in range(100)
+        )
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("admin:medicines_inventorytransaction_changelist"))
+        self.assertEqual(len(response.context["cl"].result_list), 100)
+
+    def test_stock_and_item_changelists_do_not_grow_with_rows(self):
+        baseline = {name: self.changelist_queries(name) for name in ("inventorystock", "inventoryitem")}
+        for days in range(1, 100):
+            InventoryStock.objects.create(
+                item=self.item,
+                count=1,
+                expiration_date=datetime.date.today() + datetime.timedelta(days=days),
+            )
+        for name, queries in baseline.items():
+            self.assertEqual(self.changelist_queries(name), queries)
+
+    def test_item_changelist_tolerates_missing_summaries(self):
+        StockSummary.objects.filter(item=self.item).delete()
+        response = self.client.get(reverse("admin:medicines_inventoryitem_changelist"))
+        self.assertEqual(response.status_code, 200)
+        [item] = response.context["cl"].result_list
+        self.assertEqual(admin.site._registry[InventoryItem].on_hand(item), 0)
+
+    def test_bulk_delete_action_reverts_stock(self):
+        InventoryTransaction.objects.create(
+            item_stock=self.stocks,
+            user=self.admin,
+            quantity=3,
+            transaction_type=InventoryTransaction.REMOVE,
+        )
+        self.client.post(reverse("admin:medicines_inventorytransaction_changelist"), {
+            "action": "delete_selected",
+            "_selected_action": list(InventoryTransaction.objects.values_list("pk", flat=True)),
+            "post": "yes",
+        })
+        self.assertFalse(InventoryTransaction.objects.exists())
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 5)
+
+    def test_bulk_delete_action_is_all_or_nothing(self):
+        for quantity, transaction_type in ((1, InventoryTransaction.ADD), (3, InventoryTransaction.ADD),
+                                           (7, InventoryTransaction.REMOVE)):
+            InventoryTransaction.objects.create(
+                item_stock=self.stocks,
+                user=self.admin,
+                quantity=quantity,
+                transaction_type=transaction_type,
+            )
+        # Taking both deliveries back would need 4 units; the lot holds 2.
+        response = self.client.post(reverse("admin:medicines_inventorytransaction_changelist"), {
+            "action": "delete_selected",
+            "_selected_action": list(
+                InventoryTransaction.objects.filter(transaction_type=InventoryTransaction.ADD).values_list("pk", flat=True)
+            ),
+            "post": "yes",
+        }, follow=True)
+        self.assertEqual(
+            [str(message) for message in response.context["messages"]],
+            ["Nothing was deleted: Not enough stock available."],
+        )
+        self.assertFalse(LogEntry.objects.filter(action_flag=DELETION).exists())
+        self.assertEqual(InventoryTransaction.objects.count(), 3)
+        self.assertEqual(InventoryStock.objects.get(id=self.stocks.id).count, 2)
+
+        delivery = InventoryTransaction.objects.filter(quantity=3).get()
+        response = self.client.post(
+            reverse("admin:medicines_inventorytransaction_delete", args=[delivery.pk]), {"post": "yes"}, follow=True
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [str(message) for message in response.context["messages"]],
+            ["The transaction was not deleted: Not enough stock available."],
+        )
+        self.assertFalse(LogEntry.objects.filter(action_flag=DELETION).exists())
+        self.assertTrue(InventoryTransaction.objects.filter(pk=delivery.pk).exists())
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "sqlite_stat1 estimates are SQLite only")
+    def test_paginator_uses_estimate_for_large_unfiltered_tables(self):
+        InventoryTransaction.objects.bulk_post(
+            InventoryTransaction(
+                item_stock=self.stocks, user=self.admin, quantity=1, transaction_type=InventoryTransaction.ADD
+            )
+            for _ in range(3)
+        )
+        table = InventoryTransaction._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            # Indexed tables only get per-index rows.
+            cursor.execute("SELECT idx IS NULL FROM sqlite_stat1 WHERE tbl = %s", [table])
+            self.assertEqual({null for null, in cursor.fetchall()}, {0})
+        self.assertEqual(estimated_row_count(InventoryTransaction, "default"), 3)
+
+        # As ANALYZE would record it for a large table.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "UPDATE sqlite_stat1 SET stat = '250000' || substr(stat, instr(stat, ' ')) WHERE tbl = %s",
+                [table],
+            )
+        paginator = EstimatedCountPaginator(InventoryTransaction.objects.order_by("pk"), 100)
+        self.assertEqual(paginator.count, 250000)
+        filtered = EstimatedCountPaginator(InventoryTransaction.objects.filter(quantity=2).order_by("pk"), 100)
+        self.assertEqual(filtered.count, 0)
+
+
 class InventoryStockTestCase(TestCase):
     def setUp(self):
         """Set up an inventory item for testing"""
@@ -0,0 +1,19 @@
+from django.urls import path
+
+from medicines import api, views
+
+app_name = "medicines"
+
+urlpatterns = [
+    path("export/", views.export_inventory, name="export"),
+    path("report/", views.inventory_report, name="report"),
+    path("reorder/", views.reorder_dashboard, name="reorder"),
+    path("search/", views.search_items, name="search"),
+    path("api/gtins/", api.gtin_lookup, name="api-gtins"),
+    path("api/items/<uuid:item_id>/", api.item_detail, name="api-item"),
+    path("api/items/<uuid:item_id>/lots/", api.item_lots, name="api-item-lots"),
+    path("api/items/<uuid:item_id>/stock/", api.item_stock_as_of, name="api-item-stock"),
+    path("api/items/<uuid:item_id>/archive/", api.item_archive, name="api-item-archive"),
+    path("api/items/<uuid:item_id>/receive/", api.receive, name="api-receive"),
+    path("api/items/<uuid:item_id>/dispense/", api.dispense, name="api-dispense"),
+]
@@ -1,3 +1,134 @@
+import csv
+import datetime
+import json
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_GET
+
+from medicines import reports, search
+from medicines.models import InventoryItem, ReorderAlert
+
+EXPORT_COLUMNS = (
+    "id",
+    "category__value",
+    "subcategory__value",
+    "item_name",
+    "brand_name",
+    "generic_name",
+    "dosage_form",
+    "strength_per_size",
+    "packaging__value",
+    "quantity",
+    "unit_size__value",
+    "gtin",
+    "stock_summary__total",
+    "inventorystock__id",
+    "inventorystock__expiration_date",
+    "inventorystock__date_of_delivery",
+    "inventorystock__count",
+)
+EXPORT_HEADER = [
+    column.replace("__value", "").replace("stock_summary__", "").replace("inventorystock__", "lot_")
+    for column in EXPORT_COLUMNS
+]
+
+REORDER_PAGE_SIZE = 200
+
+
+class Echo:
+    """File-like object whose ``write`` hands the line straight back."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(chunk_size=2000):
+    """One row per lot (or per item without lots), streamed off a DB cursor."""
+    return (
+        InventoryItem.objects.order_by("id", "inventorystock__expiration_date")
+        .values_list(*EXPORT_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def json_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_HEADER, row)), default=str) + "\n"
+
+
+@require_GET
+@staff_member_required
+def export_inventory(request):
+    match request.GET.get("format", "csv"):
+        case "csv":
+            lines, content_type, extension = csv_lines(export_rows()), "text/csv", "csv"
+        case "jsonl":
+            lines, content_type, extension = json_lines(export_rows()), "application/jsonl", "jsonl"
+        case other:
+            return HttpResponseBadRequest(f"Unknown export format: {other}")
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="inventory.{extension}"'
+    return response
+
+
+@require_GET
+@staff_member_required
+def inventory_report(request):
+    try:
+        weeks = int(request.GET.get("weeks", 12))
+        window = int(request.GET.get("window", 30))
+    except ValueError:
+        return HttpResponseBadRequest("weeks and window must be integers")
+    if weeks <= 0 or window <= 0:
+        return HttpResponseBadRequest("weeks and window must be positive")
+    today = datetime.date.today()
+    return render(request, "medicines/report.html", {
+        "today": today,
+        "weeks": weeks,
+        "window": window,
+        "expiry": reports.expiry_by_category_week(weeks=weeks, today=today),
+        "cover": reports.days_of_cover(window_days=window, today=today),
+    })
+
+
+@require_GET
+@staff_member_required
+def reorder_dashboard(request):
+    """Items below their reorder point, biggest shortfall first."""
+    alerts = ReorderAlert.objects.all()
+    return render(request, "medicines/reorder.html", {
+        "alerts": alerts.select_related("item").order_by("-shortfall")[:REORDER_PAGE_SIZE],
+        "count": alerts.count(),
+    })
+
 
-# Create your views here.
+@require_GET
+@staff_member_required
+def search_items(request):
+    """Type-ahead: the best few items for the text typed so far."""
+    try:
+        limit = min(int(request.GET.get("limit", 10)), 50)
+    except ValueError:
+        return HttpResponseBadRequest("limit must be an integer")
+    results = search.search(request.GET.get("q", ""), limit=limit)
+    return JsonResponse({
+        "results": [
+            {
+                "id": item.id,
+                "item_name": item.item_name,
+                "brand_name": item.brand_name,
+                "generic_name": item.generic_name,
+                "strength_per_size": item.strength_per_size,
+            }
+            for item in results
+        ]
+    })
@@ -0,0 +1,133 @@
+"""
+Per-request query and latency profiling.
+
+Enable with ``PROFILING = True`` (or ``PROFILING=1`` in the environment).
+Every request then records its wall time, SQL count and SQL time, plus the
+statements it ran more than once, into an in-process ring buffer that staff
+can read at ``/profiling/``. Responses carry the same numbers as a
+``Server-Timing`` header for the browser's network panel.
+
+The middleware sits first in ``MIDDLEWARE``, so the wall time covers every
+other middleware and the view. Streaming bodies are produced after it
+returns, so their time and queries are not counted. It runs natively under
+both WSGI and ASGI; async views keep their async path.
+
+When disabled the middleware removes itself at startup, so requests pay
+nothing for it.
+"""
+import collections
+import contextvars
+import re
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# Collapse "IN (%s, %s, ...)" so the same query over different batch sizes
+# shares a fingerprint. Parameters are already placeholders at this point.
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+profiles = collections.deque(maxlen=getattr(settings, "PROFILING_BUFFER_SIZE", 500))
+
+
+def fingerprint(sql):
+    return IN_LIST.sub("IN (...)", sql)
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that counts and times every statement."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = collections.Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+
+# The recorder of the request being served. Queries run on whichever
+# thread holds the connection (the async ORM hops to a sync thread), but
+# the context travels with them, so concurrent requests sharing a
+# connection each count only their own statements.
+current_recorder = contextvars.ContextVar("profiling_recorder", default=None)
+
+
+def dispatch(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install():
+    """Hook ``dispatch`` into this thread's connections, once each."""
+    for connection in connections.all():
+        if dispatch not in connection.execute_wrappers:
+            connection.execute_wrappers.append(dispatch)
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING", False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        install()
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.profile(request, response, recorder, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        # The same thread the async ORM and sync views run their queries on.
+        await sync_to_async(install)()
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.profile(request, response, recorder, time.perf_counter() - start)
+
+    def profile(self, request, response, recorder, elapsed):
+        profiles.append({
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "at": time.time(),
+            "duration_ms": round(elapsed * 1000, 2),
+            "sql_count": recorder.count,
+            "sql_ms": round(recorder.duration * 1000, 2),
+            "duplicates": [
+                {"sql": sql, "count": count}
+                for sql, count in recorder.fingerprints.most_common()
+                if count > 1
+            ],
+        })
+        response.headers["Server-Timing"] = (
+            f'total;dur={elapsed * 1000:.1f}, '
+            f'db;dur={recorder.duration * 1000:.1f};desc="{recorder.count} queries"'
+        )
+        return response
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings cover every other middleware and the view;
+    # a no-op unless PROFILING is on. See project/profiling.py.
+    "project.profiling.ProfilingMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,6 +63,10 @@ MIDDLEWARE = [
     "django_browser_reload.middleware.BrowserReloadMiddleware",
 ]
 
+# Per-request SQL and latency profiling, readable by staff at /profiling/.
+PROFILING = os.environ.get("PROFILING", "0") == "1"
+PROFILING_BUFFER_SIZE = int(os.environ.get("PROFILING_BUFFER_SIZE", 500))
+
 ROOT_URLCONF = 'project.urls'
 
 TEMPLATES = [
@@ -80,17 +88,96 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'project.wsgi.application'
+ASGI_APPLICATION = 'project.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default. Set DB_ENGINE=postgresql (plus the DB_* variables
+# below) to run on PostgreSQL; compose.yaml starts a local server with
+# matching defaults. On SQLite, DB_NAME is the path of the database file.
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get("DB_NAME", "pharm"),
+            'USER': os.environ.get("DB_USER", "pharm"),
+            'PASSWORD': os.environ.get("DB_PASSWORD", "pharm"),
+            'HOST': os.environ.get("DB_HOST", "127.0.0.1"),
+            'PORT': os.environ.get("DB_PORT", "5432"),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get("DB_POOL", "1") == "1":
+        # psycopg's pool owns the connections, so Django must not keep its
+        # own persistent ones (CONN_MAX_AGE has to stay 0).
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get("DB_POOL_MIN_SIZE", 2)),
+                'max_size': int(os.environ.get("DB_POOL_MAX_SIZE", 10)),
+                'timeout': int(os.environ.get("DB_POOL_TIMEOUT", 10)),
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get("DB_CONN_MAX_AGE", 60))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get("DB_NAME", BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Run on every new connection. WAL lets the admin read while
+                # a till writes; NORMAL sync is safe under WAL and skips an
+                # fsync per commit; 128 MiB mmap and a ~64 MiB page cache.
+                'init_command': (
+                    'PRAGMA journal_mode=WAL;'
+                    'PRAGMA synchronous=NORMAL;'
+                    'PRAGMA mmap_size=134217728;'
+                    'PRAGMA cache_size=-65536;'
+                ),
+                # atomic() blocks (every stock write) take the write lock at
+                # BEGIN, so a transaction never fails upgrading from a read.
+                'transaction_mode': 'IMMEDIATE',
+                # Seconds to wait on a locked database (the busy timeout).
+                'timeout': 20,
+            },
+        }
     }
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# The catalogue cache is per process in memory unless CATALOGUE_CACHE_DIR
+# points at a directory, which lets every worker on the host share it. A
+# locmem cache is only shared within one process, so each worker warms its
+# own copy; correctness does not depend on sharing, since the version that
+# retires cached records is kept in the database (see medicines.catalogue).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogue': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalogue',
+        'OPTIONS': {'MAX_ENTRIES': 50_000},
+    },
 }
+if os.environ.get("CATALOGUE_CACHE_DIR"):
+    CACHES['catalogue'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ["CATALOGUE_CACHE_DIR"],
+        'OPTIONS': {'MAX_ENTRIES': 50_000},
+    }
+CATALOGUE_CACHE_TIMEOUT = int(os.environ.get("CATALOGUE_CACHE_TIMEOUT", 24 * 3600))
+
+# Transactions older than this many days are moved to the archive table by
+# archive_transactions. Keep it above any report window in use.
+TRANSACTION_ARCHIVE_DAYS = int(os.environ.get("TRANSACTION_ARCHIVE_DAYS", 365))
 
 
 # Password validation
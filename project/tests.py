@@ -0,0 +1,73 @@
+from asgiref.sync import sync_to_async
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from medicines.models import (
+    Category,
+    CategoryType,
+    InventoryItem,
+    Packaging,
+    PackagingType,
+    Subcategory,
+    SubcategoryType,
+)
+from project import profiling
+from users.models import CustomUser
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        profiling.profiles.clear()
+        self.staff = CustomUser.objects.create_user(
+            email="staff@example.com", password="1234", is_staff=True
+        )
+
+    def test_disabled_middleware_records_nothing(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("medicines:search"), {"q": "mag"})
+        self.assertNotIn("Server-Timing", response.headers)
+        self.assertEqual(len(profiling.profiles), 0)
+
+    @override_settings(PROFILING=True)
+    def test_requests_are_profiled_and_listed_for_staff(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("medicines:search"), {"q": "mag"})
+        self.assertRegex(response.headers["Server-Timing"], r'^total;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+
+        profiles = self.client.get(reverse("profiling"), {"sort": "sql_count"}).json()["profiles"]
+        [search_profile] = [profile for profile in profiles if profile["path"] == reverse("medicines:search")]
+        self.assertGreater(search_profile["sql_count"], 0)
+        self.assertEqual(search_profile["status"], 200)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("profiling")).status_code, 302)
+
+    @override_settings(PROFILING=True)
+    async def test_async_views_are_profiled(self):
+        item = await sync_to_async(InventoryItem.objects.create)(
+            category=await sync_to_async(Category.objects.get_for)(CategoryType.ANTACIDS),
+            subcategory=await sync_to_async(Subcategory.objects.get_for)(SubcategoryType.ANTACID),
+            item_name="Magnesium Hydroxide",
+            brand_name="Phillips' Milk of Magnesia",
+            generic_name="Magnesium Hydroxide",
+            dosage_form="Liquid",
+            packaging=await sync_to_async(Packaging.objects.get_for)(PackagingType.BOTTLE),
+            quantity=120,
+        )
+        await self.async_client.aforce_login(self.staff)
+        path = reverse("medicines:api-item", args=[item.pk])
+        response = await self.async_client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Server-Timing", response.headers)
+        [api_profile] = [profile for profile in profiling.profiles if profile["path"] == path]
+        self.assertGreater(api_profile["sql_count"], 0)
+
+    def test_fingerprint_collapses_in_lists(self):
+        self.assertEqual(
+            profiling.fingerprint('SELECT 1 FROM "t" WHERE "id" IN (%s, %s, %s)'),
+            profiling.fingerprint('SELECT 1 FROM "t" WHERE "id" IN (%s)'),
+        )
+        recorder = profiling.QueryRecorder()
+        for _ in range(2):
+            recorder(lambda *args: None, "SELECT %s", (1,), False, {})
+        self.assertEqual((recorder.count, recorder.fingerprints["SELECT %s"]), (2, 2))
@@ -18,10 +18,12 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
 
-from project.views import homepage
+from project.views import homepage, profiling_report
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path("inventory/", include("medicines.urls")),
+    path("profiling/", profiling_report, name="profiling"),
     path("", homepage)
 ]
 
@@ -1,5 +1,22 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_GET
+
+from project import profiling
 
 
 def homepage(req):
-    return render(req, 'home.html')
\ No newline at end of file
+    return render(req, 'home.html')
+
+
+@require_GET
+@staff_member_required
+def profiling_report(request):
+    """Recent request profiles, newest first; ``?sort=sql_count`` or ``duration_ms`` ranks them."""
+    recent = list(profiling.profiles)[::-1]
+    sort = request.GET.get("sort")
+    if sort in ("duration_ms", "sql_count", "sql_ms"):
+        recent.sort(key=lambda profile: profile[sort], reverse=True)
+    return JsonResponse({"enabled": settings.PROFILING, "profiles": recent})
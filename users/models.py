@@ -1,8 +1,13 @@
 import uuid
 from django.db import models
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 
 
+# Owner of the transactions background jobs post.
+SYSTEM_USER_EMAIL = "system@pharm.invalid"
+
+
 class CustomUserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
@@ -25,6 +30,14 @@ class CustomUserManager(BaseUserManager):
 
         return self.create_user(email, password, **extra_fields)
 
+    def system_user(self):
+        """The inactive account that background jobs post transactions as."""
+        user, _ = self.get_or_create(
+            email=SYSTEM_USER_EMAIL,
+            defaults={"username": "system", "is_active": False, "password": make_password(None)},
+        )
+        return user
+
 # Create your models here.
 class CustomUser(AbstractUser):
     id = models.UUIDField(primary_key=True,default=uuid.uuid4)